@@ -0,0 +1,186 @@
+import os
+import numpy as np
+import pandas as pd
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from ase import Atoms
+
+from mlptools.analyzer.neighbor_list import iter_neighbor_pairs
+from mlptools.utils.utils import imap_bounded
+
+
+REPORT_COLUMNS = ["structure_id", "bond", "distance"]
+
+
+def get_bond_str(first_symbol: str, second_symbol: str) -> str:
+    """order independent bond name, e.g. O-Si for both (Si, O) and (O, Si)
+    """
+    return "-".join(sorted((first_symbol, second_symbol)))
+
+
+def _get_structure_arrays(atoms) -> Tuple:
+    """plain arrays sent to the workers instead of MLPAtoms or ase.Atoms
+    """
+    if isinstance(atoms, Atoms):
+        return atoms.positions, atoms.cell[:], atoms.get_chemical_symbols(), atoms.pbc
+    return np.asarray(atoms.coord, dtype=float), np.asarray(atoms.cell, dtype=float).reshape(3, 3), atoms.get_chemical_symbols(), True
+
+
+def _get_structure_id(atoms, idx: int):
+    if isinstance(atoms, Atoms) or atoms.structure_id is None:
+        return idx
+    return atoms.structure_id
+
+
+class CloseContactScreener():
+    """Screening of unphysically close atoms over a dataset.
+
+    Only the pairs shorter than the largest threshold are searched (one chunked
+    cell-list pass per structure), and the structures are distributed to a
+    process pool in chunks.
+
+    Parameters
+    ----------
+    thresholds : Dict[str, float]
+        minimum allowed distance for each bond, e.g. {"Si-Si": 1.8, "O-Si": 1.2}
+    default_threshold : float, optional
+        for the bonds not in thresholds, by default None (not screened)
+    """
+    def __init__(self, thresholds: Dict[str, float], default_threshold: float = None) -> None:
+        self.thresholds = {get_bond_str(*bond.split("-")): threshold for bond, threshold in thresholds.items()}
+        self.default_threshold = default_threshold
+        all_thresholds = list(self.thresholds.values()) + ([default_threshold] if default_threshold is not None else [])
+        if len(all_thresholds) == 0:
+            raise ValueError("thresholds or default_threshold must be given")
+        self.rcut = max(all_thresholds)
+
+
+    def get_threshold(self, bond: str) -> float:
+        return self.thresholds.get(bond, self.default_threshold)
+
+
+    def screen(self, atoms) -> List[Tuple[str, float]]:
+        """offending bonds of one structure (MLPAtoms or ase.Atoms)
+
+        Returns
+        -------
+        List[Tuple[str, float]]
+            (bond, minimum distance) for each bond shorter than its threshold
+        """
+        return self._screen_arrays(*_get_structure_arrays(atoms))
+
+
+    def _screen_arrays(self, positions: np.ndarray, cell: np.ndarray, symbols: List[str], pbc) -> List[Tuple[str, float]]:
+        species, types = np.unique(symbols, return_inverse=True)
+        n_species = len(species)
+        min_distance = np.full(n_species * n_species, np.inf)
+        for i, j, d in iter_neighbor_pairs(positions, cell, self.rcut, pbc=pbc):
+            not_self = i != j
+            first_types = np.minimum(types[i[not_self]], types[j[not_self]])
+            second_types = np.maximum(types[i[not_self]], types[j[not_self]])
+            np.minimum.at(min_distance, first_types * n_species + second_types, d[not_self])
+
+        contacts = []
+        for pair_type in np.flatnonzero(np.isfinite(min_distance)):
+            bond = get_bond_str(species[pair_type // n_species], species[pair_type % n_species])
+            threshold = self.get_threshold(bond)
+            if threshold is not None and min_distance[pair_type] < threshold:
+                contacts.append((bond, float(min_distance[pair_type])))
+        return contacts
+
+
+    def _screen_chunk(self, records: List[Tuple]) -> List[List[Tuple[str, float]]]:
+        return [self._screen_arrays(*record) for record in records]
+
+
+    def iter_screen(self, all_atoms: Iterable, workers: int = None, chunksize: int = 64) -> Iterator[Tuple[object, List[Tuple[str, float]]]]:
+        """screen structures streamed from any reader (list, iter_n2p2_data, HDF5AtomsStore, ...)
+
+        Parameters
+        ----------
+        all_atoms : Iterable
+            MLPAtoms or ase.Atoms
+        workers : int, optional
+            number of processes, by default os.cpu_count(). Screened in this process if 1
+        chunksize : int, optional
+            number of structures sent to a worker at once, by default 64
+
+        Yields
+        ------
+        Iterator[Tuple[object, List[Tuple[str, float]]]]
+            (atoms, offending bonds) in the input order
+        """
+        iterator = iter(all_atoms)
+        def iter_chunks():
+            while True:
+                chunk = list(islice(iterator, chunksize))
+                if len(chunk) == 0:
+                    return
+                yield chunk
+
+        if workers == 1:
+            for chunk in iter_chunks():
+                yield from zip(chunk, self._screen_chunk([_get_structure_arrays(atoms) for atoms in chunk]))
+            return
+
+        workers = os.cpu_count() if workers is None else workers
+        # the structures of the chunks in flight are kept here to be yielded with their results
+        pending_chunks = deque()
+        def iter_records():
+            for chunk in iter_chunks():
+                pending_chunks.append(chunk)
+                yield [_get_structure_arrays(atoms) for atoms in chunk]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for contacts_list in imap_bounded(executor, self._screen_chunk, iter_records(), 4 * workers):
+                yield from zip(pending_chunks.popleft(), contacts_list)
+
+
+    def get_report(self, all_atoms: Iterable, workers: int = None, chunksize: int = 64) -> pd.DataFrame:
+        """compact report of the close contacts
+
+        Returns
+        -------
+        pd.DataFrame
+            structure_id, bond, distance for each offending bond
+            (structure_id is the index in all_atoms if the structure has none)
+        """
+        rows = []
+        for idx, (atoms, contacts) in enumerate(self.iter_screen(all_atoms, workers=workers, chunksize=chunksize)):
+            structure_id = _get_structure_id(atoms, idx)
+            rows.extend((structure_id, bond, distance) for bond, distance in contacts)
+        return pd.DataFrame(rows, columns=REPORT_COLUMNS)
+
+
+    def filter(self, all_atoms: Iterable, workers: int = None, chunksize: int = 64, path2report: str = None) -> List:
+        """structures without close contacts
+
+        Parameters
+        ----------
+        path2report : str, optional
+            write the report of the dropped structures as csv, by default None
+
+        Returns
+        -------
+        List
+            structures passing the screening, in the input order
+        """
+        passed_atoms = []
+        n_dropped = 0
+        rows = []
+        for idx, (atoms, contacts) in enumerate(self.iter_screen(all_atoms, workers=workers, chunksize=chunksize)):
+            if len(contacts) == 0:
+                passed_atoms.append(atoms)
+                continue
+            n_dropped += 1
+            structure_id = _get_structure_id(atoms, idx)
+            rows.extend((structure_id, bond, distance) for bond, distance in contacts)
+
+        print(f"{len(passed_atoms)} structures passed, {n_dropped} structures dropped")
+        if path2report is not None:
+            pd.DataFrame(rows, columns=REPORT_COLUMNS).to_csv(path2report, index=False)
+        return passed_atoms
+
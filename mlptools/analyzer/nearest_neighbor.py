@@ -1,8 +1,11 @@
+import numpy as np
 from pydantic import BaseModel
 from ase import Atoms
 from typing import List, Dict
 from itertools import combinations_with_replacement
 
+from mlptools.analyzer.neighbor_list import iter_neighbor_pairs
+
 
 
 class Bond(BaseModel):
@@ -23,8 +26,71 @@ class NearestNeighborCalculator():
             raise Exception('ase_atoms must be instance of ase.Atoms')
     
 
+    def get_min_distance_matrix(self, target_symbols: List[str] = None, rcut: float = None) -> Dict[str, Dict[str, float]]:
+        """get nearest neighbor distance for every species pair in one neighbor search
+
+        Pairs are searched in chunks with a periodic cell list within rcut, and rcut is doubled
+        (only for the atoms of the species pairs not found yet) until every pair is found,
+        so that the memory is linear in the number of atoms.
+        Same as the minimum image distance, excluding the distance between an atom and its own image.
+
+        Parameters
+        ----------
+        target_symbols : List[str], optional
+            species to consider, by default all species
+        rcut : float, optional
+            initial cutoff radius, by default the mean interatomic distance
+
+        Returns
+        -------
+        Dict[str, Dict[str, float]]
+            min_distance[first_symbol][second_symbol], None if there is no such pair
+        """
+        positions = self.ase_atoms.positions
+        cell = self.ase_atoms.cell[:]
+        pbc = self.ase_atoms.pbc
+        all_species, all_types = np.unique(self.ase_atoms.get_chemical_symbols(), return_inverse=True)
+        species = [str(symbol) for symbol in all_species if target_symbols is None or symbol in target_symbols]
+        # -1 for the atoms not considered
+        type_map = np.full(len(all_species), -1)
+        type_map[np.isin(all_species, species)] = np.arange(len(species))
+        types = type_map[all_types]
+        n_species = len(species)
+        n_atoms_per_species = np.bincount(types[types >= 0], minlength=n_species)
+
+        if rcut is None:
+            volume = abs(np.linalg.det(cell)) if pbc.all() else np.prod(np.ptp(positions, axis=0) + 1.0)
+            rcut = max((volume / max(len(positions), 1)) ** (1 / 3), 1.0)
+
+        min_distance = np.full((n_species, n_species), np.inf)
+        # a pair exists if both species are present (two atoms for the same species)
+        unresolved = np.outer(n_atoms_per_species > 0, n_atoms_per_species > 0)
+        unresolved[np.diag_indices(n_species)] = n_atoms_per_species > 1
+        while unresolved.any():
+            target_types = np.flatnonzero(unresolved.any(axis=1))
+            atom_indices = np.flatnonzero(np.isin(types, target_types))
+            found = np.full(n_species * n_species, np.inf)
+            for i, j, d in iter_neighbor_pairs(positions[atom_indices], cell, rcut, pbc=pbc):
+                not_self = i != j
+                first_types = types[atom_indices[i[not_self]]]
+                second_types = types[atom_indices[j[not_self]]]
+                # each pair is visited once, fill both orders
+                np.minimum.at(found, first_types * n_species + second_types, d[not_self])
+                np.minimum.at(found, second_types * n_species + first_types, d[not_self])
+            found = found.reshape(n_species, n_species)
+            newly_resolved = unresolved & np.isfinite(found)
+            min_distance[newly_resolved] = found[newly_resolved]
+            unresolved &= ~newly_resolved
+            rcut *= 2
+
+        return {
+            first: {second: (float(min_distance[a, b]) if np.isfinite(min_distance[a, b]) else None) for b, second in enumerate(species)}
+            for a, first in enumerate(species)
+        }
+
+
     def get_nearest_neighbor(self, target_bond:Bond) -> float:
-        """get nearest neighbor distance for target-bond from distance matrix generated from ase.Atoms
+        """get nearest neighbor distance for target-bond
 
         Parameters
         ----------
@@ -36,24 +102,17 @@ class NearestNeighborCalculator():
         float
             nearest neighbor distance for target-bond
         """
-        distance_matrix = self.ase_atoms.get_all_distances(mic=True)
-        chemical_symbols = self.ase_atoms.get_chemical_symbols()
-
-        distance_list = []
-        for i in range(len(chemical_symbols)):
-            if chemical_symbols[i] != target_bond.first_atomic_symbol:
-                continue
-            for j in range(len(chemical_symbols)):
-                if chemical_symbols[j] != target_bond.second_atomic_symbol:
-                    continue
-                if i == j:
-                    continue
-                distance_list.append(distance_matrix[i, j])
-        if len(distance_list) == 0:
+        min_distance = self.get_min_distance_matrix(
+            target_symbols=[target_bond.first_atomic_symbol, target_bond.second_atomic_symbol]
+        )
+        if target_bond.first_atomic_symbol not in min_distance or target_bond.second_atomic_symbol not in min_distance:
+            return None
+        distance = min_distance[target_bond.first_atomic_symbol][target_bond.second_atomic_symbol]
+        if distance is None:
             return None
 
-        print(f"Nearst neighbor distance for {target_bond} is {min(distance_list)}")
-        return min(distance_list)
+        print(f"Nearst neighbor distance for {target_bond} is {distance}")
+        return distance
     
 
     def get_possible_bonds(self, chemical_symbols: List[str]) -> List[Bond]:
@@ -86,4 +145,11 @@ class NearestNeighborCalculator():
         """
         chemical_symbols = self.ase_atoms.get_chemical_symbols()
         all_bonds = self.get_possible_bonds(chemical_symbols)
-        return {bond.bond_str: self.get_nearest_neighbor(bond) for bond in all_bonds}
+        min_distance = self.get_min_distance_matrix()
+        nearest_neighbor_dict = {}
+        for bond in all_bonds:
+            distance = min_distance[bond.first_atomic_symbol][bond.second_atomic_symbol]
+            if distance is not None:
+                print(f"Nearst neighbor distance for {bond} is {distance}")
+            nearest_neighbor_dict[bond.bond_str] = distance
+        return nearest_neighbor_dict
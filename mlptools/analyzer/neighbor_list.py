@@ -0,0 +1,145 @@
+import numpy as np
+from typing import Iterator, Tuple
+
+from ase.neighborlist import primitive_neighbor_list
+
+
+def _prepare_arrays(positions: np.ndarray, cell: np.ndarray, rcut: float, pbc) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    pbc = np.array([pbc] * 3 if np.isscalar(pbc) else pbc, dtype=bool)
+    cell = np.asarray(cell, dtype=float).reshape(3, 3)
+    positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+    if not pbc.any() and len(positions) > 0:
+        # bin over the bounding box, the cell of an isolated structure may be empty
+        origin = positions.min(axis=0)
+        cell = np.diag(positions.max(axis=0) - origin + rcut)
+        positions = positions - origin
+    return positions, cell, pbc
+
+
+def get_neighbor_pairs(
+        positions: np.ndarray,
+        cell: np.ndarray,
+        rcut: float,
+        pbc: bool = True,
+        quantities: str = "ijd"
+    ) -> Tuple[np.ndarray, ...]:
+    """All pairs within rcut found with a periodic cell list.
+
+    Works for triclinic cells and for cutoffs longer than the cell (periodic
+    images are included). Pairs are ordered, i.e. both (i, j) and (j, i) are
+    returned, and memory is linear in the number of pairs.
+
+    Parameters
+    ----------
+    positions : np.ndarray
+        (n_atoms, 3) cartesian positions
+    cell : np.ndarray
+        (3, 3) cell vectors as rows
+    rcut : float
+        cutoff radius
+    pbc : bool, optional
+        periodic boundary condition, by default True
+    quantities : str, optional
+        see ase.neighborlist.primitive_neighbor_list
+        (i, j: atom index, d: distance, D: distance vector, S: shift), by default "ijd"
+
+    Returns
+    -------
+    Tuple[np.ndarray, ...]
+        arrays in the order of quantities
+    """
+    positions, cell, pbc = _prepare_arrays(positions, cell, rcut, pbc)
+    return primitive_neighbor_list(
+        quantities,
+        pbc=pbc,
+        cell=cell,
+        positions=positions,
+        cutoff=rcut,
+    )
+
+
+# the bin itself and the half of the 26 neighboring bins, so that each pair is visited once
+HALF_SHELL_OFFSETS = np.array(
+    [(0, 0, 0)] + [(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1) if (x, y, z) > (0, 0, 0)]
+)
+
+
+def iter_neighbor_pairs(
+        positions: np.ndarray,
+        cell: np.ndarray,
+        rcut: float,
+        pbc: bool = True,
+        chunk_size: int = 1 << 16
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Pairs within rcut in chunks, for structures too large to hold all pairs at once.
+
+    Atoms are sorted into bins of at least rcut (fractional grid, so triclinic
+    cells work) and each bin is compared with itself and 13 of its neighbors.
+    Each unordered pair (including pairs with a periodic image of the same
+    atom) is yielded once. Memory is linear in the number of atoms plus the
+    pairs of chunk_size atoms.
+
+    Parameters
+    ----------
+    positions : np.ndarray
+        (n_atoms, 3) cartesian positions
+    cell : np.ndarray
+        (3, 3) cell vectors as rows
+    rcut : float
+        cutoff radius
+    pbc : bool, optional
+        periodic boundary condition, by default True
+    chunk_size : int, optional
+        number of atoms whose pairs are yielded at once, by default 1 << 16
+
+    Yields
+    ------
+    Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]
+        i, j, d
+    """
+    positions, cell, pbc = _prepare_arrays(positions, cell, rcut, pbc)
+    if len(positions) == 0:
+        return
+    volume = abs(np.linalg.det(cell))
+    heights = volume / np.linalg.norm(np.cross(cell[[1, 2, 0]], cell[[2, 0, 1]]), axis=1)
+    n_bins = np.maximum(1, (heights // rcut).astype(int))
+    if np.any(pbc & (n_bins < 3)):
+        # a neighboring bin would be visited twice through the periodic boundary
+        i, j, d, S = get_neighbor_pairs(positions, cell, rcut, pbc=pbc, quantities="ijdS")
+        S_sign = np.sign(S[:, 0] * 4 + S[:, 1] * 2 + S[:, 2])
+        once = (i < j) | ((i == j) & (S_sign > 0))
+        for start in range(0, len(i), chunk_size):
+            yield i[once][start:start + chunk_size], j[once][start:start + chunk_size], d[once][start:start + chunk_size]
+        return
+
+    frac = positions @ np.linalg.inv(cell)
+    frac[:, pbc] -= np.floor(frac[:, pbc])
+    positions = frac @ cell
+    bin_xyz = np.clip(np.floor(frac * n_bins).astype(int), 0, n_bins - 1)
+    bin_idx = np.ravel_multi_index(bin_xyz.T, n_bins)
+    order = np.argsort(bin_idx, kind="stable")
+    counts = np.bincount(bin_idx, minlength=np.prod(n_bins))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    for chunk_start in range(0, len(order), chunk_size):
+        sorted_idx = np.arange(chunk_start, min(chunk_start + chunk_size, len(order)))
+        atom_idx = order[sorted_idx]
+        neighbor_xyz = bin_xyz[atom_idx][:, None, :] + HALF_SHELL_OFFSETS[None, :, :]
+        image = np.floor_divide(neighbor_xyz, n_bins)
+        is_valid = np.all(pbc | (image == 0), axis=2)
+        neighbor_bin = np.ravel_multi_index(np.moveaxis(neighbor_xyz - image * n_bins, 2, 0), n_bins)
+        neighbor_start = starts[neighbor_bin]
+        neighbor_count = np.where(is_valid, counts[neighbor_bin], 0)
+        # in the same bin, only the atoms after this one
+        bin_end = neighbor_start[:, 0] + neighbor_count[:, 0]
+        neighbor_start[:, 0] = sorted_idx + 1
+        neighbor_count[:, 0] = bin_end - sorted_idx - 1
+
+        neighbor_count = neighbor_count.ravel()
+        total = neighbor_count.sum()
+        j = order[np.repeat(neighbor_start.ravel() - np.cumsum(neighbor_count) + neighbor_count, neighbor_count) + np.arange(total)]
+        i = np.repeat(np.repeat(atom_idx, len(HALF_SHELL_OFFSETS)), neighbor_count)
+        shift = np.repeat((image @ cell).reshape(-1, 3), neighbor_count, axis=0)
+        d = np.linalg.norm(positions[j] + shift - positions[i], axis=1)
+        is_neighbor = d < rcut
+        yield i[is_neighbor], j[is_neighbor], d[is_neighbor]
@@ -1,4 +1,5 @@
-from mlptools.io.read import read_from_format
+from mlptools.io.read import read_many
+from mlptools.utils.utils import open_file, resolve_compressed_path
 from typing import List
 import pandas as pd
 import os
@@ -17,7 +18,7 @@ class PairPotentialAnalyzer():
         return False
     
 
-    def get_from_espresso(self, atoms_dirs: List[str]) -> pd.DataFrame:
+    def get_from_espresso(self, atoms_dirs: List[str], workers: int = None) -> pd.DataFrame:
         # """Quantum espressoの計算結果から、ペアポテンシャルを取得する
 
         # Parameters
@@ -29,14 +30,12 @@ class PairPotentialAnalyzer():
             "distance": [],
             "energy": []
         }
-        for atom_d in atoms_dirs:
-            try:
-                atoms = read_from_format(atom_d, format="espresso-in")
-                pair_potential_dict["distance"].append(atoms.get_atomic_distance())
-                pair_potential_dict["energy"].append(atoms.energy)
-            except Exception as e:
-                print(e)
+        for atom_d, atoms in zip(atoms_dirs, read_many(atoms_dirs, format="espresso-in", workers=workers)):
+            if isinstance(atoms, Exception):
+                print(f"{atom_d}: {atoms}")
                 continue
+            pair_potential_dict["distance"].append(atoms.get_atomic_distance())
+            pair_potential_dict["energy"].append(atoms.energy)
 
         pair_potential_df = pd.DataFrame.from_dict(pair_potential_dict)
         pair_potential_df.sort_values(by="distance", inplace=True)
@@ -51,14 +50,15 @@ class PairPotentialAnalyzer():
         }
 
         for scf_d in atoms_dirs:
-            with open(os.path.join(scf_d, 'scf.out')) as f:
+            with open_file(resolve_compressed_path(os.path.join(scf_d, 'scf.out'))) as f:
                 scf_out_lines = [s.strip() for s in f.readlines()]
             if not self.validate_espresso_out(scf_out_lines):
                 print(f"scf.out in {scf_d} is not valid")
                 continue
             
             # get atoms from input
-            atoms = read_espresso_in(os.path.join(scf_d, 'scf.in'))
+            with open_file(resolve_compressed_path(os.path.join(scf_d, 'scf.in'))) as f:
+                atoms = read_espresso_in(f)
             distance = atoms.get_distance(0, 1)
 
             # get energy
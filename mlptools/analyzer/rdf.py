@@ -0,0 +1,138 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Tuple
+
+from ase import Atoms
+
+from mlptools.analyzer.neighbor_list import get_neighbor_pairs
+from mlptools.utils.utils import imap_bounded
+
+
+def get_structure_arrays(atoms) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """positions, cell and chemical symbols of ase.Atoms or MLPAtoms without building ase.Atoms
+    """
+    if isinstance(atoms, Atoms):
+        return atoms.positions, atoms.cell[:], atoms.get_chemical_symbols()
+    return np.asarray(atoms.coord, dtype=float), np.asarray(atoms.cell, dtype=float).reshape(3, 3), atoms.get_chemical_symbols()
+
+
+class RDFCalculator():
+    """Partial radial distribution functions from a periodic cell list.
+
+    The output has the same layout as MLPAtoms.get_rdf_for_multiple_species:
+    "distance" holds the bin centers and "A-B" the partial RDF of every species
+    pair, with species ordered by first appearance. Partial RDFs are normalized
+    so that the total RDF is sum_AB c_A c_B g_AB.
+
+    Parameters
+    ----------
+    rcut : float, optional
+        cutoff radius, by default 6
+    bins : int, optional
+        number of bins, by default 100
+    """
+    def __init__(self, rcut: float = 6, bins: int = 100) -> None:
+        self.rcut = rcut
+        self.bins = bins
+        self.edges = np.linspace(0, rcut, bins + 1)
+        self.distance = 0.5 * (self.edges[1:] + self.edges[:-1])
+        self.shell_volume = 4.0 / 3.0 * np.pi * (self.edges[1:]**3 - self.edges[:-1]**3)
+        self.reset()
+
+
+    def reset(self) -> None:
+        self._rdf_sum: Dict[str, np.ndarray] = {}
+        self._n_frames: Dict[str, int] = {}
+
+
+    def compute(self, atoms) -> Dict[str, np.ndarray]:
+        """partial RDFs of one structure (ase.Atoms or MLPAtoms)
+        """
+        positions, cell, symbols = get_structure_arrays(atoms)
+        species, types = np.unique(symbols, return_inverse=True)
+        # order species by first appearance
+        first_appearance = np.argsort(np.unique(types, return_index=True)[1])
+        rank = np.empty_like(first_appearance)
+        rank[first_appearance] = np.arange(len(first_appearance))
+        species = species[first_appearance]
+        types = rank[types]
+        n_species = len(species)
+
+        i, j, d = get_neighbor_pairs(positions, cell, self.rcut, quantities="ijd")
+        # the last edge is excluded so that d == rcut does not overflow
+        bin_idx = np.minimum((d / self.rcut * self.bins).astype(np.int64), self.bins - 1)
+        pair_type = types[i] * n_species + types[j]
+        counts = np.bincount(pair_type * self.bins + bin_idx, minlength=n_species * n_species * self.bins)
+        counts = counts.reshape(n_species, n_species, self.bins)
+
+        volume = abs(np.linalg.det(cell))
+        n_per_species = np.bincount(types, minlength=n_species)
+        rdf = {"distance": self.distance.copy()}
+        for a in range(n_species):
+            for b in range(a, n_species):
+                # ordered pairs i in a, j in b
+                rdf[f"{species[a]}-{species[b]}"] = volume * counts[a, b] / (n_per_species[a] * n_per_species[b] * self.shell_volume)
+        return rdf
+
+
+    def add_frame(self, atoms) -> None:
+        """accumulate the RDFs of a frame for get_rdf
+        """
+        self._add_rdf(self.compute(atoms))
+
+
+    def _add_rdf(self, rdf: Dict[str, np.ndarray]) -> None:
+        for name, value in rdf.items():
+            if name == "distance":
+                continue
+            if name not in self._rdf_sum:
+                self._rdf_sum[name] = np.zeros(self.bins)
+                self._n_frames[name] = 0
+            self._rdf_sum[name] += value
+            self._n_frames[name] += 1
+
+
+    def get_rdf(self) -> Dict[str, np.ndarray]:
+        """RDFs averaged over the accumulated frames (each pair over the frames that contain it)
+        """
+        rdf = {"distance": self.distance.copy()}
+        for name, value in self._rdf_sum.items():
+            rdf[name] = value / self._n_frames[name]
+        return rdf
+
+
+    def compute_trajectory(self, frames: Iterable, workers: int = 1, max_in_flight: int = None) -> Dict[str, np.ndarray]:
+        """RDFs averaged over frames
+
+        Parameters
+        ----------
+        frames : Iterable
+            ase.Atoms or MLPAtoms, e.g. iter_lmp_dump(...) or LammpsTrajectory(...)[::50]
+        workers : int, optional
+            number of processes. Frames are computed in parallel if > 1, by default 1
+        max_in_flight : int, optional
+            frames submitted ahead of the results, by default 4 * workers
+
+        Returns
+        -------
+        Dict[str, np.ndarray]
+            same layout as compute
+        """
+        self.reset()
+        if workers == 1:
+            for atoms in frames:
+                self.add_frame(atoms)
+            return self.get_rdf()
+
+        max_in_flight = 4 * workers if max_in_flight is None else max_in_flight
+        # send plain arrays to the workers instead of pickling ase objects
+        frame_arrays = (get_structure_arrays(atoms) for atoms in frames)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for rdf in imap_bounded(executor, self._compute_from_arrays, frame_arrays, max_in_flight):
+                self._add_rdf(rdf)
+        return self.get_rdf()
+
+
+    def _compute_from_arrays(self, arrays: Tuple[np.ndarray, np.ndarray, List[str]]) -> Dict[str, np.ndarray]:
+        positions, cell, symbols = arrays
+        return self.compute(Atoms(symbols=symbols, positions=positions, cell=cell, pbc=True))
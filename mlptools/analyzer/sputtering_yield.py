@@ -3,6 +3,8 @@ from typing import List, Optional
 import numpy as np
 import pandas as pd
 
+from mlptools.utils.utils import open_file, resolve_compressed_path
+
 
 class SputteringYieldCalculator():
 
@@ -14,8 +16,10 @@ class SputteringYieldCalculator():
         self.path2target = path2target
         self.etch_file_name = etch_file_name
         self.inject_atom_every_timestep = inject_atom_every_timestep
+        # etch.dat.gz etc. are read without decompressing to disk
+        self.path2etch = resolve_compressed_path(os.path.join(path2target, etch_file_name))
 
-        if not os.path.exists(os.path.join(path2target, etch_file_name)):
+        if not os.path.exists(self.path2etch):
             raise FileNotFoundError("The etch file is not found in the target directory.")
         # 入射したイオン数
         self.n_injected_atoms = self.get_n_injected_atoms()
@@ -31,7 +35,7 @@ class SputteringYieldCalculator():
 
 
     def build_timestep_block(self) -> List[List[str]]:
-        with open(os.path.join(self.path2target, self.etch_file_name), mode="r") as f:
+        with open_file(self.path2etch, mode="r") as f:
             lines = [s.strip() for s in f.readlines()]
         
         idx_list = []
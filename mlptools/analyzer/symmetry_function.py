@@ -1,38 +1,557 @@
-from typing import Dict, List
+from typing import Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import json
 import os
 import pandas as pd
 import numpy as np
 import math
 
+from ase.data import atomic_numbers
+
 from mlptools.config.symmetry_function import RadialSymmetryFunctionConfig, AngularSymmetryFunctionConfig
-from mlptools.utils.utils import remove_empty_from_array, log_decorator
+from mlptools.utils.utils import remove_empty_from_array, log_decorator, open_file, resolve_compressed_path, imap_bounded, get_file_signature
+
+def _scan_atomic_env_chunk(chunk: bytes) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """chunk内の各行の元素記号を行ごとのPythonループなしで求める (空行は除く)
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        元素記号のコード, 元素記号の開始位置, 元素記号の長さ, 行の開始位置, 行の長さ(改行を除く)
+    """
+    buf = np.frombuffer(chunk, dtype=np.uint8)
+    line_ends = np.flatnonzero(buf == 10)
+    line_starts = np.r_[0, line_ends[:-1] + 1]
+    # 元素記号は行頭の数バイトにある ("%2s"なら先頭2バイト)
+    padded = np.r_[buf, np.full(8, 10, dtype=np.uint8)]
+    window = padded[line_starts[:, None] + np.arange(8)]
+    is_space = (window == 32) | (window == 9) | (window == 13)
+    window_in_line = np.cumsum(window == 10, axis=1) == 0
+    is_char = ~is_space & window_in_line
+    has_symbol = is_char.any(axis=1)
+    window, is_char = window[has_symbol], is_char[has_symbol]
+    line_starts, line_ends = line_starts[has_symbol], line_ends[has_symbol]
+
+    first = np.argmax(is_char, axis=1)
+    rows = np.arange(len(window))
+    symbol_codes = np.zeros(len(window), dtype=np.int64)
+    symbol_lengths = np.zeros(len(window), dtype=np.int64)
+    is_in_symbol = np.ones(len(window), dtype=bool)
+    for k in range(3):
+        idx = np.minimum(first + k, window.shape[1] - 1)
+        is_in_symbol &= is_char[rows, idx]
+        symbol_codes |= np.where(is_in_symbol, window[rows, idx], 0).astype(np.int64) << (8 * (2 - k))
+        symbol_lengths += is_in_symbol
+    if np.any(is_char[rows, np.minimum(first + 3, window.shape[1] - 1)] & is_in_symbol):
+        raise ValueError("Unknown format of atomic-env.G")
+    return symbol_codes, line_starts + first, symbol_lengths, line_starts, line_ends - line_starts
+
+
+def _decode_symbol(symbol_code: int) -> str:
+    return bytes([(symbol_code >> shift) & 0xff for shift in (16, 8, 0)]).rstrip(b"\x00").decode()
+
+
+# 10**k (k <= 22) is exact in double precision
+_EXACT_POWERS_OF_TEN = np.array([10.0**k for k in range(23)])
+
+
+def _parse_fixed_width_fields(fields: np.ndarray) -> np.ndarray:
+    """" %16.8E"の固定幅(17バイト)の値を桁ごとに整数演算で変換する
+
+    仮数(9桁の整数)と10のべき乗はどちらもdoubleで正確なので、1回の乗算/除算で
+    strtodと同じ(正しく丸められた)値になる。それ以外の値(指数が3桁など)はastypeで変換する
+
+    Parameters
+    ----------
+    fields : np.ndarray
+        (n, 17) uint8
+
+    Returns
+    -------
+    np.ndarray
+        (n,) float
+    """
+    # 桁ごとに連続したメモリで計算する
+    columns = np.ascontiguousarray(fields.T)
+    digits = {k: columns[k] - np.uint8(48) for k in (3, 5, 6, 7, 8, 9, 10, 11, 12, 15, 16)}
+    is_exact = (columns[0] == 32) & (columns[1] == 32) & ((columns[2] == 32) | (columns[2] == 45))
+    is_exact &= (columns[4] == 46) & (columns[13] == 69) & ((columns[14] == 43) | (columns[14] == 45))
+    mantissa = np.zeros(len(fields), dtype=np.int64)
+    for k in (3, 5, 6, 7, 8, 9, 10, 11, 12):
+        # uint8の引き算なので数字以外は9より大きくなる
+        is_exact &= digits[k] <= 9
+        mantissa *= 10
+        mantissa += digits[k]
+    is_exact &= (digits[15] <= 9) & (digits[16] <= 9)
+    exponent = digits[15].astype(np.int64) * 10 + digits[16]
+    shift = np.where(columns[14] == 45, -exponent, exponent) - 8
+    is_exact &= np.abs(shift) <= 22
+
+    power = _EXACT_POWERS_OF_TEN[np.minimum(np.abs(shift), 22)]
+    values = np.where(shift >= 0, mantissa * power, mantissa / power)
+    np.negative(values, out=values, where=columns[2] == 45)
+    if not is_exact.all():
+        values[~is_exact] = np.ascontiguousarray(fields[~is_exact]).view("S17").ravel().astype(float)
+    return values
+
+
+def _parse_atomic_env_chunk(chunk: bytes, n_sf_dict: Dict[str, int]) -> Dict[str, np.ndarray]:
+    """chunkの値を元素ごとの行列にする (2パス目, プロセスプールからも呼ぶ)
+    """
+    symbol_codes, symbol_starts, symbol_lengths, line_starts, line_lengths = _scan_atomic_env_chunk(chunk)
+    unique_symbol_codes = np.unique(symbol_codes)
+    symbols = [_decode_symbol(int(symbol_code)) for symbol_code in unique_symbol_codes]
+    buf = np.frombuffer(chunk, dtype=np.uint8)
+
+    n_values = np.zeros(len(symbol_codes), dtype=np.int64)
+    for symbol_code, symbol in zip(unique_symbol_codes, symbols):
+        n_values[symbol_codes == symbol_code] = n_sf_dict[symbol]
+
+    # n2p2の書式("%2s"と" %16.8E"の固定幅)なら元素記号と改行を除くと値が17バイトずつ並ぶ
+    values = None
+    if np.all(symbol_starts + symbol_lengths == line_starts + 2) and np.all(line_lengths == 2 + 17 * n_values):
+        is_field = np.ones(len(buf), dtype=bool)
+        is_field[line_starts] = False
+        is_field[line_starts + 1] = False
+        is_field[buf == 10] = False
+        fields = buf[is_field]
+        # 空白だけの行などがあれば汎用の変換にする
+        if len(fields) == 17 * n_values.sum():
+            values = _parse_fixed_width_fields(fields.reshape(-1, 17))
+    if values is None:
+        # 元素記号を空白で上書きして数値だけをC実装でパースする
+        buf = buf.copy()
+        for k in range(3):
+            buf[symbol_starts[symbol_lengths > k] + k] = 32
+        values = np.fromstring(buf.tobytes(), dtype=float, sep=" ")
+    if len(values) != n_values.sum():
+        raise ValueError("Number of symmetry functions is not consistent in atomic-env.G")
+    value_offsets = np.cumsum(n_values) - n_values
+
+    chunk_sf_val_dict = {}
+    for symbol_code, symbol in zip(unique_symbol_codes, symbols):
+        rows = np.flatnonzero(symbol_codes == symbol_code)
+        chunk_sf_val_dict[symbol] = values[value_offsets[rows, None] + np.arange(n_sf_dict[symbol])]
+    return chunk_sf_val_dict
+
+
+def _get_chunk_n_sf_dict(chunk: bytes) -> Dict[str, int]:
+    """chunkに含まれる元素ごとの1原子あたりの対称性関数の数 (各元素の最初の行から取得する)
+    """
+    symbol_codes, _, _, line_starts, _ = _scan_atomic_env_chunk(chunk)
+    n_sf_dict = {}
+    for symbol_code in np.unique(symbol_codes):
+        line_start = line_starts[np.argmax(symbol_codes == symbol_code)]
+        n_sf_dict[_decode_symbol(int(symbol_code))] = len(chunk[line_start:chunk.index(b"\n", line_start)].split()) - 1
+    return n_sf_dict
+
+
+def _get_atomic_env_chunk_statistics(chunk: bytes) -> "SymmetryFunctionStatistics":
+    """chunkの統計量 (プロセスプールからも呼ぶ)
+    """
+    statistics = SymmetryFunctionStatistics()
+    statistics.update_dict(_parse_atomic_env_chunk(chunk, _get_chunk_n_sf_dict(chunk)))
+    return statistics
+
+
+class SymmetryFunctionStatistics():
+    """元素・対称性関数ごとの最小値, 最大値, 平均, 分散の逐次集計
+
+    値はまとまった行ごとに集計し, Welford法の一般化(Chan et al.)で既存の集計と
+    マージするので, 全ての値をメモリに載せずに1パスで求まる.
+    並列に集計した部分結果もmergeで同じ式で足し合わせられる.
+    sigmaはn2p2のscaling.dataと同じく標本数で割った標準偏差
+    """
+    SCALING_DATA_FORMAT = "{:10d} {:10d} {:24.16E} {:24.16E} {:24.16E} {:24.16E}\n"
+
+    def __init__(self) -> None:
+        self.count: Dict[str, int] = {}
+        self.min: Dict[str, np.ndarray] = {}
+        self.max: Dict[str, np.ndarray] = {}
+        self.mean: Dict[str, np.ndarray] = {}
+        # 平均からの偏差の2乗和
+        self.m2: Dict[str, np.ndarray] = {}
+
+
+    @property
+    def symbols(self) -> List[str]:
+        """集計した元素記号 (n2p2と同じく原子番号順)
+        """
+        return sorted(self.count.keys(), key=lambda symbol: atomic_numbers[symbol])
+
+
+    def _merge_element(self, symbol: str, count: int, min_: np.ndarray, max_: np.ndarray, mean: np.ndarray, m2: np.ndarray) -> None:
+        if count == 0:
+            return
+        if symbol not in self.count:
+            self.count[symbol] = count
+            self.min[symbol], self.max[symbol] = min_.copy(), max_.copy()
+            self.mean[symbol], self.m2[symbol] = mean.copy(), m2.copy()
+            return
+        if len(mean) != len(self.mean[symbol]):
+            raise ValueError(f"Number of symmetry functions of {symbol} is not consistent: {len(self.mean[symbol])} and {len(mean)}")
+        total = self.count[symbol] + count
+        delta = mean - self.mean[symbol]
+        self.mean[symbol] = self.mean[symbol] + delta * (count / total)
+        self.m2[symbol] = self.m2[symbol] + m2 + delta**2 * (self.count[symbol] * count / total)
+        self.min[symbol] = np.minimum(self.min[symbol], min_)
+        self.max[symbol] = np.maximum(self.max[symbol], max_)
+        self.count[symbol] = total
+
+
+    def update(self, symbol: str, values: np.ndarray) -> "SymmetryFunctionStatistics":
+        """(原子数, 対称性関数の数)の値を集計に加える
+
+        Parameters
+        ----------
+        symbol : str
+            元素記号
+        values : np.ndarray
+            1行が1原子の対称性関数の値
+        """
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return self
+        mean = values.mean(axis=0)
+        self._merge_element(symbol, len(values), values.min(axis=0), values.max(axis=0), mean, ((values - mean)**2).sum(axis=0))
+        return self
+
+
+    def update_dict(self, sf_val_dict: Dict[str, np.ndarray], block_size: int = 1 << 16) -> "SymmetryFunctionStatistics":
+        """元素記号をkeyとした行列(read_arraysのメモリマップやSymmetryFunctionCalculatorの結果)を集計に加える
+
+        Parameters
+        ----------
+        block_size : int, optional
+            一度に集計する行数 (メモリマップ全体を読み込まないため), by default 1 << 16
+        """
+        for symbol, sf_val in sf_val_dict.items():
+            for start in range(0, len(sf_val), block_size):
+                self.update(symbol, sf_val[start:start + block_size])
+        return self
+
+
+    def merge(self, other: "SymmetryFunctionStatistics") -> "SymmetryFunctionStatistics":
+        """別の(並列に集計した)部分結果を足し合わせる
+        """
+        for symbol in other.count:
+            self._merge_element(symbol, other.count[symbol], other.min[symbol], other.max[symbol], other.mean[symbol], other.m2[symbol])
+        return self
+
+
+    def get_sigma(self, symbol: str) -> np.ndarray:
+        return np.sqrt(self.m2[symbol] / self.count[symbol])
+
+
+    def get_dataframe(self, symbol: str, columns: List[str] = None) -> pd.DataFrame:
+        """対称性関数ごとのmin, max, mean, sigma
+
+        Parameters
+        ----------
+        columns : List[str], optional
+            indexにする対称性関数のカラム名, by default None (1始まりの番号)
+        """
+        index = np.arange(1, len(self.mean[symbol]) + 1) if columns is None else columns
+        return pd.DataFrame(
+            {"min": self.min[symbol], "max": self.max[symbol], "mean": self.mean[symbol], "sigma": self.get_sigma(symbol)},
+            index=index
+        )
+
+
+    def write_scaling_data(self, path2output: str) -> None:
+        """n2p2のscaling.dataと同じ書式で書き出す (元素と対称性関数の番号は1始まり)
+        """
+        header = [
+            "#" * 80,
+            "# Symmetry function scaling data.",
+            "#" * 80,
+            "# Col  Name     Description",
+            "#" * 80,
+            "# 1    e_index  Element index.",
+            "# 2    sf_index Symmetry function index.",
+            "# 3    sf_min   Symmetry function minimum.",
+            "# 4    sf_max   Symmetry function maximum.",
+            "# 5    sf_mean  Symmetry function mean.",
+            "# 6    sf_sigma Symmetry function sigma.",
+            "#" * 121,
+            "#" + "".join(f"{col:>10d} " for col in (1, 2)) + "".join(f"{col:>24d} " for col in (3, 4, 5, 6)).rstrip(),
+            "#" + "".join(f"{name:>10s} " for name in ("e_index", "sf_index")) + "".join(f"{name:>24s} " for name in ("sf_min", "sf_max", "sf_mean", "sf_sigma")).rstrip(),
+            "#" * 121,
+        ]
+        with open(path2output, mode="w") as f:
+            f.write("\n".join(header) + "\n")
+            for e_index, symbol in enumerate(self.symbols, start=1):
+                sigma = self.get_sigma(symbol)
+                f.writelines(
+                    self.SCALING_DATA_FORMAT.format(e_index, sf_index + 1, self.min[symbol][sf_index], self.max[symbol][sf_index], self.mean[symbol][sf_index], sigma[sf_index])
+                    for sf_index in range(len(sigma))
+                )
+        print(f"Symmetry function scaling data is written to {path2output}")
+
 
 class SymmetryFunctionValueReader():
-    def __init__(self, path2target, path2nnpscaling=None):
-        # check file existence
-        if not os.path.exists(os.path.join(path2target, "atomic-env.G")):
+    # bytes of atomic-env.G parsed at once
+    CHUNK_SIZE = 1 << 24
+    # <atomic-env.G>.cache/ holds <element>.npy and columns.json
+    CACHE_SUFFIX = ".cache"
+    CACHE_META_FILENAME = "columns.json"
+
+    def __init__(self, path2target, path2nnpscaling=None, use_cache=True, path2cache=None):
+        # check file existence (gzip, xz or bz2 compressed files are also accepted)
+        path2atomic_env = resolve_compressed_path(os.path.join(path2target, "atomic-env.G"))
+        if not os.path.exists(path2atomic_env):
             raise ValueError("atomic-env.G does not exist")
-        if not os.path.exists(os.path.join(path2target, "input.nn")):
+        path2input_nn = resolve_compressed_path(os.path.join(path2target, "input.nn"))
+        if not os.path.exists(path2input_nn):
             raise ValueError("input.nn does not exist")
         
         path2nnpscaling = os.path.join(path2target, "nnp-scaling.log.0000") if path2nnpscaling is None else path2nnpscaling
+        path2nnpscaling = resolve_compressed_path(path2nnpscaling)
         if not os.path.exists(path2nnpscaling):
-            raise ValueError(f"nnp-scaling.log.0000 does not exist in {path2nnpscaling}")
-        print("All files exist")
+            # カラム名はinput.nnからn2p2の順に並べて作る
+            print(f"WARNING: nnp-scaling.log.0000 does not exist in {path2nnpscaling}, symmetry function columns are created from input.nn")
+            path2nnpscaling = None
+        else:
+            print("All files exist")
         
         self.path2target = path2target
+        self.path2atomic_env = path2atomic_env
+        self.path2input_nn = path2input_nn
         self.path2nnpscaling = path2nnpscaling
+        # 2回目以降はatomic-env.Gをパースせずにキャッシュをメモリマップする
+        self.use_cache = use_cache
+        self.path2cache = path2atomic_env + self.CACHE_SUFFIX if path2cache is None else path2cache
+        self.cached_columns: Dict[str, List[str]] = {}
+
+    def _get_cache_signature(self) -> List[List[int]]:
+        """atomic-env.G, input.nn, nnp-scaling.log.0000の(size, mtime_ns) (logがなければNone)
+        """
+        return [
+            list(get_file_signature(path)) if path is not None else None
+            for path in (self.path2atomic_env, self.path2input_nn, self.path2nnpscaling)
+        ]
+
+
+    def _get_path2cache_array(self, symbol: str) -> str:
+        return os.path.join(self.path2cache, f"{symbol}.npy")
+
+
+    def load_cache(self) -> Dict[str, np.ndarray]:
+        """キャッシュした行列を読み込まずにメモリマップする
+
+        Returns
+        -------
+        Dict[str, np.ndarray]
+            元素記号をkeyとした読み取り専用の行列, キャッシュがないか元ファイルが変更されていればNone
+        """
+        path2meta = os.path.join(self.path2cache, self.CACHE_META_FILENAME)
+        if not os.path.exists(path2meta):
+            return None
+        with open(path2meta, mode="r") as f:
+            meta = json.load(f)
+        if meta.get("signature") != self._get_cache_signature():
+            return None
+        if any(not os.path.exists(self._get_path2cache_array(symbol)) for symbol in meta["symbols"]):
+            return None
+        self.cached_columns = {symbol: columns for symbol, columns in meta["columns"].items() if columns is not None}
+        print(f"Load symmetry function values from {self.path2cache}")
+        return {symbol: np.load(self._get_path2cache_array(symbol), mmap_mode="r") for symbol in meta["symbols"]}
+
+
+    def _allocate_arrays(self, row_counts: Dict[str, Tuple[int, int]]) -> Dict[str, np.ndarray]:
+        """キャッシュの.npyを直接書き込み先として確保する (書き込めなければメモリ上に確保する)
+        """
+        if self.use_cache:
+            try:
+                os.makedirs(self.path2cache, exist_ok=True)
+                # 書き込み中のキャッシュを有効と判定しないように先にメタデータを消す
+                path2meta = os.path.join(self.path2cache, self.CACHE_META_FILENAME)
+                if os.path.exists(path2meta):
+                    os.remove(path2meta)
+                return {
+                    symbol: np.lib.format.open_memmap(self._get_path2cache_array(symbol), mode="w+", dtype=float, shape=shape)
+                    for symbol, shape in row_counts.items()
+                }
+            except OSError as e:
+                print(f"WARNING: could not write cache {self.path2cache}: {e}")
+        return {symbol: np.empty(shape, dtype=float) for symbol, shape in row_counts.items()}
+
+
+    def save_cache(self, sf_val_dict: Dict[str, np.memmap]) -> None:
+        """_allocate_arraysでキャッシュの.npyにメモリマップした行列を書き出し、カラム名と元ファイルのsignatureを保存する
+        """
+        columns = {}
+        for symbol, sf_val in sf_val_dict.items():
+            sf_val.flush()
+            try:
+                columns[symbol] = self.get_symmetry_function_columns(number_of_sf_per_atom=sf_val.shape[1], target_atom_symbol=symbol)
+            except (ValueError, IndexError):
+                # nnp-scaling.log.0000に対応する元素がない場合はカラム名なしで保存する
+                columns[symbol] = None
+        meta = {"signature": self._get_cache_signature(), "symbols": list(sf_val_dict.keys()), "columns": columns}
+        try:
+            with open(os.path.join(self.path2cache, self.CACHE_META_FILENAME), mode="w") as f:
+                json.dump(meta, f)
+        except OSError as e:
+            print(f"WARNING: could not write cache {self.path2cache}: {e}")
+            return
+        self.cached_columns = {symbol: symbol_columns for symbol, symbol_columns in columns.items() if symbol_columns is not None}
+
+
+    def _iter_chunks(self):
+        """atomic-env.Gをchunk_sizeバイト程度の行単位のchunkで読み込む
+        """
+        with open_file(self.path2atomic_env, mode="rb") as f:
+            while True:
+                chunk = f.read(self.CHUNK_SIZE)
+                if len(chunk) == 0:
+                    return
+                # 行の途中で切らない
+                chunk += f.readline()
+                if not chunk.endswith(b"\n"):
+                    chunk += b"\n"
+                yield chunk
+
+
+    def count_rows(self) -> Dict[str, Tuple[int, int]]:
+        """atomic-env.Gの元素ごとの原子数と1原子あたりの対称性関数の数を数える (1パス目)
+
+        Returns
+        -------
+        Dict[str, Tuple[int, int]]
+            元素記号をkeyとした(原子数, 対称性関数の数)
+        """
+        row_counts = {}
+        for chunk in self._iter_chunks():
+            symbol_codes = _scan_atomic_env_chunk(chunk)[0]
+            for symbol_code in np.unique(symbol_codes):
+                symbol = _decode_symbol(int(symbol_code))
+                if symbol not in row_counts:
+                    # 値の数は各元素の最初の行から取得する (2パス目で全行を検証する)
+                    row_counts[symbol] = (0, _get_chunk_n_sf_dict(chunk)[symbol])
+                n_rows, n_sf = row_counts[symbol]
+                row_counts[symbol] = (n_rows + int((symbol_codes == symbol_code).sum()), n_sf)
+        return row_counts
+
+
+    def read_arrays(self, atom_num_symbol_map: Dict[int, str] = None, workers: int = 1) -> Dict[str, np.ndarray]:
+        """対称性関数の値を元素ごとに確保した行列にchunkごとに直接書き込む
+
+        1パス目で元素ごとの原子数を数えて行列を確保し、2パス目でchunk単位で
+        パースした値を書き込む。1原子ごとの配列は作らない
+        use_cacheなら行列はatomic-env.Gの隣のキャッシュ(.npy)に書き込まれ、
+        atomic-env.G, input.nn, nnp-scaling.log.0000が変更されるまでは
+        パースせずにメモリマップした読み取り専用の行列を返す
+
+        Parameters
+        ----------
+        atom_num_symbol_map : Dict[int, str], optional
+            原子番号と元素記号の対応表, by default None (atomic-env.Gに含まれる全元素)
+        workers : int, optional
+            chunkを並列にパースするプロセス数, by default 1
+
+        Returns
+        -------
+        Dict[str, np.ndarray]
+            元素記号をkeyとした(原子数, 対称性関数の数)の行列 (atomic-env.Gの順)
+            キャッシュを使う場合は初回も読み取り専用のメモリマップ
+        """
+        sf_val_dict = self.load_cache() if self.use_cache else None
+        if sf_val_dict is None:
+            sf_val_dict = self._parse_arrays(workers=workers)
+
+        symbols = list(sf_val_dict.keys()) if atom_num_symbol_map is None else list(atom_num_symbol_map.values())
+        if len(set(sf_val_dict.keys()) - set(symbols)) > 0:
+            raise ValueError("Unknown atomic number please check atom_num_symbol_map")
+        return {symbol: sf_val_dict[symbol] if symbol in sf_val_dict else np.empty((0, 0)) for symbol in symbols}
+
+
+    def _parse_arrays(self, workers: int = 1) -> Dict[str, np.ndarray]:
+        """atomic-env.Gの全元素をパースする (use_cacheならキャッシュの.npyに直接書き込み, 読み取り専用で開き直して返す)
+        """
+        row_counts = self.count_rows()
+        sf_val_dict = self._allocate_arrays(row_counts)
+        n_atoms = sum(n_rows for n_rows, _ in row_counts.values())
+        n_sf_dict = {symbol: n_sf for symbol, (_, n_sf) in row_counts.items()}
+        parse_chunk = partial(_parse_atomic_env_chunk, n_sf_dict=n_sf_dict)
+
+        n_filled = {symbol: 0 for symbol in sf_val_dict}
+        n_read = 0
+        if workers == 1:
+            chunk_results = map(parse_chunk, self._iter_chunks())
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            chunk_results = imap_bounded(executor, parse_chunk, self._iter_chunks(), 2 * workers)
+        try:
+            for chunk_sf_val_dict in chunk_results:
+                for symbol, chunk_sf_val in chunk_sf_val_dict.items():
+                    sf_val_dict[symbol][n_filled[symbol]:n_filled[symbol] + len(chunk_sf_val)] = chunk_sf_val
+                    n_filled[symbol] += len(chunk_sf_val)
+                    n_read += len(chunk_sf_val)
+                print(f"[PROGRESS] {n_read}/{n_atoms}")
+        finally:
+            if workers != 1:
+                executor.shutdown()
+
+        if not all(isinstance(sf_val, np.memmap) for sf_val in sf_val_dict.values()):
+            return sf_val_dict
+        self.save_cache(sf_val_dict)
+        # 書き込み用(w+)のメモリマップを返すと行列の変更がキャッシュに書き込まれるので読み取り専用で開き直す
+        cached_sf_val_dict = self.load_cache()
+        if cached_sf_val_dict is None:
+            # メタデータを書き込めなかった場合はメモリ上の行列を返す
+            cached_sf_val_dict = {symbol: np.array(sf_val) for symbol, sf_val in sf_val_dict.items()}
+        del sf_val_dict
+        return cached_sf_val_dict
+
+
+    def compute_statistics(self, workers: int = 1) -> SymmetryFunctionStatistics:
+        """元素・対称性関数ごとの最小値, 最大値, 平均, 分散をatomic-env.Gの1パスで集計する
+
+        行列を確保せずにchunkごとの部分結果をマージするので, atomic-env.Gがメモリに
+        載らなくてもよい. 有効なキャッシュがあればメモリマップした行列から集計する
+        write_scaling_dataでnnp-scalingを実行せずにscaling.dataを作り直せる
+
+        Parameters
+        ----------
+        workers : int, optional
+            chunkを並列に集計するプロセス数, by default 1
+
+        Returns
+        -------
+        SymmetryFunctionStatistics
+            集計結果
+        """
+        statistics = SymmetryFunctionStatistics()
+        sf_val_dict = self.load_cache() if self.use_cache else None
+        if sf_val_dict is not None:
+            return statistics.update_dict(sf_val_dict)
+
+        if workers == 1:
+            chunk_results = map(_get_atomic_env_chunk_statistics, self._iter_chunks())
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            chunk_results = imap_bounded(executor, _get_atomic_env_chunk_statistics, self._iter_chunks(), 2 * workers)
+        try:
+            for chunk_statistics in chunk_results:
+                statistics.merge(chunk_statistics)
+                print(f"[PROGRESS] {sum(statistics.count.values())} atoms")
+        finally:
+            if workers != 1:
+                executor.shutdown()
+        return statistics
+
 
     def symmetry_function_values_dict(
             self, 
-            atom_num_symbol_map: Dict[int, str]
-        ) -> Dict[str, List[float]]:
+            atom_num_symbol_map: Dict[int, str],
+            workers: int = 1
+        ) -> Dict[str, np.ndarray]:
         """対称性関数の値をatomic-env.Gから取得する
 
         Parameters
         ----------
-        path2target : str
-            atomic-env.Gまでへのパス
         atom_num_symbol_map : Dict[int, str]
             原子番号と元素記号の対応表
             (ex)
@@ -43,39 +562,15 @@ class SymmetryFunctionValueReader():
 
         Returns
         -------
-        Dict[str, List[float]]
-            元素記号をkeyとした対称性関数の値のリスト
+        Dict[str, np.ndarray]
+            元素記号をkeyとした対称性関数の値の行列 (1行が1原子)
 
         Raises
         ------
         ValueError
-            _description_
-        ValueError
-            _description_
+            atom_num_symbol_mapにない元素がある場合
         """
-
-        # 初期化
-        sf_val_list_dict = {}
-        for _, atom_symbol in atom_num_symbol_map.items():
-            sf_val_list_dict[atom_symbol] = []
-        
-        # 対称性関数の読み込み
-        with open(os.path.join(self.path2target, "atomic-env.G"), "r") as f:
-            lines = [s.strip() for s in f.readlines()]
-        n_atoms = len(lines)
-        for i, l in enumerate(lines):
-            # show progress every 10000 lines
-            if i % 10000 == 0:
-                print(f"[PROGRESS] {i}/{n_atoms}")
-            l_splitted = l.split()
-            atomic_symbol = l_splitted[0]
-            sf_vec = np.array(l_splitted[1:], dtype=float)
-
-            if atomic_symbol in sf_val_list_dict.keys():
-                sf_val_list_dict[atomic_symbol].append(sf_vec)
-            else:
-                raise ValueError("Unknown atomic number please check atom_num_symbol_map")
-        return sf_val_list_dict
+        return self.read_arrays(atom_num_symbol_map=atom_num_symbol_map, workers=workers)
 
 
     def get_symmetry_function_columns(
@@ -111,10 +606,13 @@ class SymmetryFunctionValueReader():
         """
 
 
-        if not os.path.exists(os.path.join(self.path2target, 'input.nn')):
+        if not os.path.exists(self.path2input_nn):
             raise ValueError("input.nn does not exist")
+
+        if self.path2nnpscaling is None:
+            return self._get_symmetry_function_columns_from_input_nn(number_of_sf_per_atom, target_atom_symbol)
         
-        with open(os.path.join(self.path2nnpscaling), mode='r') as f:
+        with open_file(self.path2nnpscaling, mode='r') as f:
             scaling_log_lines = [s.strip() for s in f.readlines()]
 
         keyword = f"Short range atomic symmetry functions element"
@@ -132,7 +630,7 @@ class SymmetryFunctionValueReader():
         sf_info_list_raw = scaling_log_lines[keyword_idx+4: keyword_idx+4+number_of_sf_per_atom]
         line_number_in_setting_file_list = [int(sf_info.split(' ')[-1]) for sf_info in sf_info_list_raw]
         
-        with open(os.path.join(self.path2target, 'input.nn'), mode='r') as f:
+        with open_file(self.path2input_nn, mode='r') as f:
             lines = [s.strip() for s in f.readlines()]
 
             target_sf_lines = [lines[idx-1] for idx in line_number_in_setting_file_list]
@@ -144,35 +642,66 @@ class SymmetryFunctionValueReader():
         return sf_columns
 
 
+    def _get_symmetry_function_columns_from_input_nn(self, number_of_sf_per_atom: int, target_atom_symbol: str) -> List[str]:
+        """nnp-scaling.log.0000がない場合にinput.nnの対称性関数をn2p2の順に並べたカラム名
+        """
+        setting_reader = SymmetryFunctionSettingReader(self.path2target)
+        radial_table = setting_reader.get_radial_sf_table()
+        angular_table = setting_reader.get_angular_sf_table()
+        if target_atom_symbol not in radial_table and target_atom_symbol not in angular_table:
+            raise ValueError(f"{target_atom_symbol} does not exist")
+        sf_columns = [
+            column for table in (radial_table, angular_table) if target_atom_symbol in table
+            for column in table[target_atom_symbol]["column"].tolist()
+        ]
+        if len(sf_columns) != number_of_sf_per_atom:
+            raise ValueError(f"{target_atom_symbol} has {len(sf_columns)} symmetry functions in input.nn, not {number_of_sf_per_atom}")
+        print(f"{target_atom_symbol} symmetry function columns are created from input.nn")
+        return sf_columns
+
+
     def read(
         self,
         atom_num_symbol_map: Dict[int, str],
-        number_of_sf_per_atom: int
+        number_of_sf_per_atom: int = None,
+        workers: int = 1
     ) -> Dict[str, pd.DataFrame]:
         """対称性関数の値を元素記号ごとにDataframeで返却する
+        Dataframeはread_arraysの行列をコピーせずに参照する
+        (キャッシュを使う場合は読み取り専用なので, 値を変更するときは.copy()する)
 
         Parameters
         ----------
         atom_num_symbol_map : Dict[int, str]
             原子番号と元素記号の対応表
-        number_of_sf_per_atom : int
-            1原子あたりの対称性関数の数
+        number_of_sf_per_atom : int, optional
+            1原子あたりの対称性関数の数, by default None (atomic-env.Gから取得)
+        workers : int, optional
+            chunkを並列にパースするプロセス数, by default 1
 
         Returns
         -------
         Dict[str, pd.DataFrame]
             元素記号をkeyとした対称性関数の値のDataframe
         """
-        sf_val_list_dict = self.symmetry_function_values_dict(
-            atom_num_symbol_map=atom_num_symbol_map
+        sf_val_dict = self.symmetry_function_values_dict(
+            atom_num_symbol_map=atom_num_symbol_map,
+            workers=workers
         )
         sf_val_df_dict = {}
-        for atom_symbol, sf_val_list in sf_val_list_dict.items():
-            sf_columns = self.get_symmetry_function_columns(
-                number_of_sf_per_atom=number_of_sf_per_atom,
-                target_atom_symbol=atom_symbol
-            )
-            sf_val_df_dict[atom_symbol] = pd.DataFrame(sf_val_list, columns=sf_columns)
+        for atom_symbol, sf_val in sf_val_dict.items():
+            if number_of_sf_per_atom is not None and len(sf_val) == 0:
+                sf_val = np.empty((0, number_of_sf_per_atom))
+            if number_of_sf_per_atom is not None and sf_val.shape[1] != number_of_sf_per_atom:
+                raise ValueError(f"{atom_symbol} has {sf_val.shape[1]} symmetry functions, not {number_of_sf_per_atom}")
+            if len(self.cached_columns.get(atom_symbol, [])) == sf_val.shape[1]:
+                sf_columns = self.cached_columns[atom_symbol]
+            else:
+                sf_columns = self.get_symmetry_function_columns(
+                    number_of_sf_per_atom=sf_val.shape[1] if number_of_sf_per_atom is None else number_of_sf_per_atom,
+                    target_atom_symbol=atom_symbol
+                )
+            sf_val_df_dict[atom_symbol] = pd.DataFrame(sf_val, columns=sf_columns, copy=False)
             print(f"Symmetry function dataframe of {atom_symbol} is created")
         return sf_val_df_dict
 
@@ -202,50 +731,163 @@ class SymmetryFunction:
         return 2**(1-zeta) * (1 + lambdas * np.cos(theta))**zeta
 
 
+# n2p2の対称性関数の並び順 (中心元素ごと, 元素は原子番号順)
+RADIAL_SF_SORT_KEYS = ["rcut", "eta", "rs", "neighbor_z"]
+ANGULAR_SF_SORT_KEYS = ["rcut", "eta", "zeta", "lambdas", "neighbor1_z", "neighbor2_z", "rs"]
+
+
+def compile_sf_table(table: Dict[str, np.ndarray]) -> Dict[str, Dict[str, np.ndarray]]:
+    """1種類(radialかangular)の対称性関数の列ごとの配列を中心元素ごとにn2p2の順に並べる
+
+    Parameters
+    ----------
+    table : Dict[str, np.ndarray]
+        center, neighbor (angularはneighbor1, neighbor2)と対称性関数のパラメータ
+        (radial: eta, rs, rcut, angular: eta, lambdas, zeta, rcut, rs)の配列, 1要素が1つの対称性関数
+
+    Returns
+    -------
+    Dict[str, Dict[str, np.ndarray]]
+        中心元素(原子番号順)をkeyとした同じ列の配列とbond
+        (angularの2つの隣接元素は原子番号順に入れ替える)
+    """
+    table = {name: np.asarray(values) for name, values in table.items()}
+    is_angular = "neighbor1" in table
+    if is_angular:
+        neighbor1_z = np.array([atomic_numbers[symbol] for symbol in table["neighbor1"]], dtype=int)
+        neighbor2_z = np.array([atomic_numbers[symbol] for symbol in table["neighbor2"]], dtype=int)
+        is_swapped = neighbor1_z > neighbor2_z
+        table["neighbor1"], table["neighbor2"] = (
+            np.where(is_swapped, table["neighbor2"], table["neighbor1"]), np.where(is_swapped, table["neighbor1"], table["neighbor2"])
+        )
+        table["neighbor1_z"], table["neighbor2_z"] = np.minimum(neighbor1_z, neighbor2_z), np.maximum(neighbor1_z, neighbor2_z)
+        bond_parts = [table["center"], table["neighbor1"], table["neighbor2"]]
+        sort_keys = ANGULAR_SF_SORT_KEYS
+    else:
+        table["neighbor_z"] = np.array([atomic_numbers[symbol] for symbol in table["neighbor"]], dtype=int)
+        bond_parts = [table["center"], table["neighbor"]]
+        sort_keys = RADIAL_SF_SORT_KEYS
+    table["bond"] = np.array(["-".join(parts) for parts in zip(*bond_parts)], dtype=str)
+
+    compiled_table = {}
+    for center in sorted(set(table["center"].tolist()), key=lambda symbol: atomic_numbers[symbol]):
+        rows = np.flatnonzero(table["center"] == center)
+        # lexsortは最後のkeyが優先
+        rows = rows[np.lexsort([table[key][rows] for key in sort_keys[::-1]])]
+        compiled_table[center] = {name: values[rows] for name, values in table.items() if not name.endswith("_z")}
+    return compiled_table
+
+
+def group_sf_table_by_bond(compiled_table: Dict[str, Dict[str, np.ndarray]]) -> Dict[str, Dict[str, np.ndarray]]:
+    """compile_sf_tableの結果をbondごとに分ける (各bondの中はn2p2の順のまま)
+    """
+    bond_table = {}
+    for center_table in compiled_table.values():
+        bonds, first_idx = np.unique(center_table["bond"], return_index=True)
+        for bond in bonds[np.argsort(first_idx)]:
+            is_bond = center_table["bond"] == bond
+            bond_table[str(bond)] = {name: values[is_bond] for name, values in center_table.items()}
+    return bond_table
+
+
 class SymmetryFunctionSettingReader():
     SF_TYPE_IDX = 2
 
     def __init__(self, path2target, input_filename="input.nn") -> None:
-        path2input = os.path.join(path2target, input_filename)
+        path2input = resolve_compressed_path(os.path.join(path2target, input_filename))
         if not os.path.exists(path2input):
             raise ValueError(f"{input_filename} does not exist")
         
         self.path2input = path2input
-    
+        # input.nnは最初に使うときに1回だけ読み込む
+        self._lines: List[str] = None
+
+
+    def _read_lines(self) -> List[str]:
+        if self._lines is None:
+            with open_file(self.path2input, mode="r") as f:
+                self._lines = [s.strip() for s in f.readlines()]
+        return self._lines
+
+
+    def _get_sf_lines_with_number(self, sf_type: str) -> List[Tuple[int, List[str]]]:
+        """(input.nnの行番号(1始まり), 空白で分割した行)のリスト
+        """
+        return [
+            (line_number, line.split())
+            for line_number, line in enumerate(self._read_lines(), start=1)
+            if line.startswith("symfunction_short") and line.split()[self.SF_TYPE_IDX] == sf_type
+        ]
 
-    def read_sf_setting_lines(self):
-        with open(self.path2input, mode="r") as f:
-            lines = [s.strip() for s in f.readlines()]
 
-        sf_lines = list(filter(lambda s: s.startswith("symfunction_short"), lines))
+    def read_sf_setting_lines(self):
+        sf_lines = list(filter(lambda s: s.startswith("symfunction_short"), self._read_lines()))
         return sf_lines
 
 
     def get_radial_sf_lines(self):
-        sf_lines = self.read_sf_setting_lines()
-        sf_lines_splitted = [line.strip().split() for line in sf_lines]
-        radial_sf_lines = list(filter(lambda s: s[self.SF_TYPE_IDX] == "2", sf_lines_splitted))
-        return radial_sf_lines
+        return [line_splitted for _, line_splitted in self._get_sf_lines_with_number("2")]
 
 
     def get_angular_sf_lines(self):
-        sf_lines = self.read_sf_setting_lines()
-        sf_lines_splitted = [line.strip().split() for line in sf_lines]
-        angular_sf_lines = list(filter(lambda s: s[self.SF_TYPE_IDX] == "3", sf_lines_splitted))
-        return angular_sf_lines
+        return [line_splitted for _, line_splitted in self._get_sf_lines_with_number("3")]
 
 
-    def _get_radial_sf_config(self) -> Dict[str, List[RadialSymmetryFunctionConfig]]:
-        """n2p2の入力ファイルからRadialSymmetryFunctionConfigのリストをバリュー、結合をキーとする辞書を返却する
+    def _get_sf_table(self, sf_type: str, fields: Dict[str, int]) -> Dict[str, np.ndarray]:
+        """input.nnの対称性関数の行を列ごとの配列にする (元素記号以外はfloat)
+        """
+        lines = self._get_sf_lines_with_number(sf_type)
+        table = {}
+        for name, idx in fields.items():
+            values = [line_splitted[idx] if len(line_splitted) > idx else "0.0" for _, line_splitted in lines]
+            table[name] = np.array(values, dtype=str) if name in ("center", "neighbor", "neighbor1", "neighbor2") else np.array(values, dtype=float)
+        table["line"] = np.array([line_number for line_number, _ in lines], dtype=int)
+        # SymmetryFunctionValueReaderと同じカラム名
+        table["column"] = np.array(["_".join(self._read_lines()[line_number - 1].split(' ')[1:]) for line_number, _ in lines], dtype=str)
+        return table
+
+
+    def get_radial_sf_table(self, by_bond: bool = False) -> Dict[str, Dict[str, np.ndarray]]:
+        """radialの対称性関数のパラメータを中心元素ごとにn2p2の順に並べた配列
+
+        Parameters
+        ----------
+        by_bond : bool, optional
+            bond(中心元素-隣接元素)をkeyにする, by default False (中心元素をkeyにする)
 
         Returns
         -------
-        Dict[str, List[RadialSymmetryFunctionConfig]]
-            _description_
+        Dict[str, Dict[str, np.ndarray]]
+            neighbor, eta, rs, rcut, bond, line(input.nnの行番号), columnの配列
+        """
+        table = compile_sf_table(self._get_sf_table("2", {"center": 1, "neighbor": 3, "eta": 4, "rs": 5, "rcut": 6}))
+        return group_sf_table_by_bond(table) if by_bond else table
+
+
+    def get_angular_sf_table(self, by_bond: bool = False) -> Dict[str, Dict[str, np.ndarray]]:
+        """angularの対称性関数のパラメータを中心元素ごとにn2p2の順に並べた配列
+
+        Parameters
+        ----------
+        by_bond : bool, optional
+            bond(中心元素-隣接元素1-隣接元素2, 隣接元素は原子番号順)をkeyにする, by default False
+
+        Returns
+        -------
+        Dict[str, Dict[str, np.ndarray]]
+            neighbor1, neighbor2, eta, lambdas, zeta, rcut, rs, bond, line, columnの配列
+        """
+        table = compile_sf_table(self._get_sf_table(
+            "3", {"center": 1, "neighbor1": 3, "neighbor2": 4, "eta": 5, "lambdas": 6, "zeta": 7, "rcut": 8, "rs": 9}
+        ))
+        return group_sf_table_by_bond(table) if by_bond else table
+
+
+    def get_radial_sf_config_list(self) -> List[RadialSymmetryFunctionConfig]:
+        """RadialSymmetryFunctionConfigのリストをinput.nnの順に返却する
         """
         radial_sf_lines = self.get_radial_sf_lines()
         radial_sf_config_list = []
-        radial_sf_config_dict = {}
 
         # RadialSymmetryFunctionConfigのリストを作成
         print(f"Number of Radial Symmetry Funciton: {len(radial_sf_lines)}")
@@ -257,16 +899,12 @@ class SymmetryFunctionSettingReader():
                 rcut=float(radial_sf_line[6])
             )
             radial_sf_config_list.append(radial_sf_config)
-        # bondをキーとした辞書を作成
-        for radial_sf_config in radial_sf_config_list:
-            if radial_sf_config_dict.get(radial_sf_config.bond) is None:
-                radial_sf_config_dict[radial_sf_config.bond] = []
-            else:
-                radial_sf_config_dict[radial_sf_config.bond].append(radial_sf_config)
-        return radial_sf_config_dict
+        return radial_sf_config_list
 
 
-    def _get_angular_sf_config(self) -> Dict[str, List[AngularSymmetryFunctionConfig]]:
+    def get_angular_sf_config_list(self) -> List[AngularSymmetryFunctionConfig]:
+        """AngularSymmetryFunctionConfigのリストをinput.nnの順に返却する
+        """
         angular_sf_lines = self.get_angular_sf_lines()
         # AngularSymmetryFunctionConfigのリストを作成
         print(f"Number of Angular Symmetry Funciton: {len(angular_sf_lines)}")
@@ -278,16 +916,56 @@ class SymmetryFunctionSettingReader():
                     eta=float(angular_sf_line[5]),
                     lambdas=float(angular_sf_line[6]),
                     zeta=float(angular_sf_line[7]),
-                    rcut=float(angular_sf_line[8])
+                    rcut=float(angular_sf_line[8]),
+                    # optional shift of the angular symmetry function
+                    rs=float(angular_sf_line[9]) if len(angular_sf_line) > 9 else 0.0
                 )
             )
+        return angular_sf_config_list
+
+
+    def get_cutoff_type(self) -> Tuple[int, float]:
+        """cutoff_typeの設定をinput.nnから取得する
+
+        Returns
+        -------
+        Tuple[int, float]
+            cutoff type (1: cos, 2: tanh^3) and alpha (inner cutoff / rcut)
+        """
+        for line in self._read_lines():
+            line_splitted = line.split("#")[0].split()
+            if len(line_splitted) >= 2 and line_splitted[0] == "cutoff_type":
+                cutoff_alpha = float(line_splitted[2]) if len(line_splitted) > 2 else 0.0
+                return int(line_splitted[1]), cutoff_alpha
+        return 1, 0.0
+
+
+    def _get_radial_sf_config(self) -> Dict[str, List[RadialSymmetryFunctionConfig]]:
+        """n2p2の入力ファイルからRadialSymmetryFunctionConfigのリストをバリュー、結合をキーとする辞書を返却する
+
+        Returns
+        -------
+        Dict[str, List[RadialSymmetryFunctionConfig]]
+            _description_
+        """
+        radial_sf_config_list = self.get_radial_sf_config_list()
+        radial_sf_config_dict = {}
+        # bondをキーとした辞書を作成
+        for radial_sf_config in radial_sf_config_list:
+            if radial_sf_config_dict.get(radial_sf_config.bond) is None:
+                radial_sf_config_dict[radial_sf_config.bond] = []
+            radial_sf_config_dict[radial_sf_config.bond].append(radial_sf_config)
+        return radial_sf_config_dict
+
+
+    def _get_angular_sf_config(self) -> Dict[str, List[AngularSymmetryFunctionConfig]]:
+        angular_sf_config_list = self.get_angular_sf_config_list()
         # bondをキーとした辞書を作成
         angular_sf_config_dict = {}
         for angular_sf_config in angular_sf_config_list:
             if angular_sf_config_dict.get(angular_sf_config.bond) is None:
                 angular_sf_config_dict[angular_sf_config.bond] = []
-            else:
-                angular_sf_config_dict[angular_sf_config.bond].append(angular_sf_config)
+            angular_sf_config_dict[angular_sf_config.bond].append(angular_sf_config)
         return angular_sf_config_dict
 
     @log_decorator
@@ -333,4 +1011,36 @@ class SymmetryFunctionVisualizer():
         ax.set_ylabel(r'$2^{1-\zeta} (1+\lambda \cos\theta_{ijk})^\zeta$', fontsize=fontsize)
         ax.set_xlim(0, 360)
         y = sf.ang_symmetry_function_3(theta=theta, lambdas=config.lambdas, zeta=config.zeta)
-        ax.plot(theta, y, label=f'λ: {config.lambdas}, ζ: {config.zeta}')
\ No newline at end of file
+        ax.plot(theta, y, label=f'λ: {config.lambdas}, ζ: {config.zeta}')
+
+
+    def plot_sf_radial_table(self, table: Dict[str, np.ndarray], rmax: float, ax, cutoff_type=1, cutoff_alpha=0.0, fontsize=12) -> None:
+        """
+        plot all radial sf of a table (a value of SymmetryFunctionSettingReader.get_radial_sf_table) evaluated at once
+        """
+        # descriptorがこのモジュールをimportするので循環importを避ける
+        from mlptools.descriptor.symmetry_function import get_radial_sf_values
+
+        r_ij = np.linspace(0, rmax, 100)
+        ax.set_title(f'Radial symmetry functions: G2', fontsize=fontsize)
+        ax.set_xlabel(f'r(Å)', fontsize=fontsize)
+        ax.set_ylabel('$e^{-\\eta}(R_{ij}-R_s)^2f_c(R_{ij})$', fontsize=fontsize)
+        sf_values = get_radial_sf_values(table, r_ij, cutoff_type=cutoff_type, cutoff_alpha=cutoff_alpha)
+        for sf_value, eta, rs in zip(sf_values.T, table["eta"], table["rs"]):
+            ax.plot(r_ij, sf_value, label=f'η: {eta}, Rs: {rs}')
+
+
+    def plot_sf_ang_table(self, table: Dict[str, np.ndarray], ax, fontsize=12) -> None:
+        """
+        plot the angular part of all angular sf of a table (a value of SymmetryFunctionSettingReader.get_angular_sf_table)
+        """
+        from mlptools.descriptor.symmetry_function import get_angular_sf_values
+
+        theta = np.linspace(0, 360)
+        ax.set_title(f'Angular symmetry functions: G3', fontsize=fontsize)
+        ax.set_xlabel(r'$\theta(°)$', fontsize=fontsize)
+        ax.set_ylabel(r'$2^{1-\zeta} (1+\lambda \cos\theta_{ijk})^\zeta$', fontsize=fontsize)
+        ax.set_xlim(0, 360)
+        sf_values = get_angular_sf_values(table, theta)
+        for sf_value, lambdas, zeta in zip(sf_values.T, table["lambdas"], table["zeta"]):
+            ax.plot(theta, sf_value, label=f'λ: {lambdas}, ζ: {zeta}')
@@ -1,16 +1,23 @@
 import numpy as np
 
 from ase import Atoms
+from ase.symbols import string2symbols
 from ase.neighborlist import NeighborList
-
-from ovito.modifiers import CoordinationAnalysisModifier
-from ovito.pipeline import StaticSource, Pipeline
-from ovito.io.ase import ase_to_ovito
-from typing import Dict
+from typing import Dict, List
 
 from mlptools.analyzer.nearest_neighbor import NearestNeighborCalculator
 
 class MLPAtoms:
+    """Structure record holding cell, coordinates, energy and forces.
+
+    Arrays passed in are stored as they are (not copied). The ase.Atoms view is
+    only built the first time ase_atoms is accessed, unless one is passed in.
+    """
+    __slots__ = (
+        'cell', 'coord', 'energy', 'force', 'total_magnetization', 'n_atoms', 'structure_id',
+        'symbols', 'frame', 'additional_info', 'path', '_ase_atoms', 'distance_btw_nearest_neighbor',
+    )
+
     def __init__(self, cell, coord, energy, force, n_atoms, total_magnetization=None, structure_id=None, symbols=None, frame=None, additional_info=None, path=None, ase_atoms=None) -> None:
         self.cell = cell
         self.coord = coord
@@ -23,9 +30,31 @@ class MLPAtoms:
         self.frame = frame
         self.additional_info = additional_info
         self.path = path
-        self.set_ase_atoms()
+        self._ase_atoms = ase_atoms
 
         self.distance_btw_nearest_neighbor = None
+
+    @property
+    def ase_atoms(self) -> Atoms:
+        if self._ase_atoms is None:
+            self.set_ase_atoms()
+        return self._ase_atoms
+
+    @ase_atoms.setter
+    def ase_atoms(self, ase_atoms: Atoms) -> None:
+        self._ase_atoms = ase_atoms
+
+    def __getstate__(self):
+        return {name: getattr(self, name, None) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        # pickles written before __slots__ was introduced hold the instance __dict__
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **(state[1] or {})}
+        if 'ase_atoms' in state:
+            state['_ase_atoms'] = state.pop('ase_atoms')
+        for name in self.__slots__:
+            setattr(self, name, state.get(name))
     
     def get_volume(self):
         cell = self.cell
@@ -46,8 +75,17 @@ class MLPAtoms:
     def get_atomic_volume(self):
         return self.get_volume() / self.n_atoms
     
+    def get_chemical_symbols(self) -> List[str]:
+        """chemical symbol of every atom without building ase.Atoms
+        """
+        if self.symbols is None:
+            raise Exception('Set symbols')
+        if isinstance(self.symbols, str):
+            return string2symbols(self.symbols)
+        return [str(s) for s in self.symbols]
+    
     def set_ase_atoms(self):
-        self.ase_atoms = Atoms(
+        self._ase_atoms = Atoms(
             symbols=self.symbols,
             positions=self.coord,
             cell=self.cell,
@@ -55,17 +93,12 @@ class MLPAtoms:
             )
 
     def get_ase_atoms(self):
-        if self.ase_atoms is not None:
-            return self.ase_atoms
+        if self._ase_atoms is not None:
+            return self._ase_atoms
         
         if self.symbols is None:
             raise Exception('Set symbols')
-        return Atoms(
-            symbols=self.symbols,
-            positions=self.coord,
-            cell=self.cell,
-            pbc=(1,1,1)
-            )
+        return self.ase_atoms
 
     def set_distance_btw_nearest_neighbor(self) -> None:
         """set distance(ang) between nearest neighbor
@@ -84,12 +117,8 @@ class MLPAtoms:
         Returns:
             np.ndarray: 1st: distance, 2nd: rdf value
         """
-        ase_atoms = self.get_ase_atoms()
-        pipeline = Pipeline(source = StaticSource(data=ase_to_ovito(ase_atoms)))
-        modifier = CoordinationAnalysisModifier(cutoff=rcut, number_of_bins=bins, partial=True)
-        pipeline.modifiers.append(modifier)
-        rdf_table = pipeline.compute().tables['coordination-rdf']
-        return rdf_table.xy()
+        rdf_dict = self.get_rdf_for_multiple_species(rcut=rcut, bins=bins)
+        return np.stack(list(rdf_dict.values()), axis=1)
     
     def get_rdf_for_multiple_species(self, rcut=6, bins=100) -> Dict[str, np.ndarray]:
         """get radial distribution function table
@@ -101,15 +130,6 @@ class MLPAtoms:
         Returns:
             Dict[str, np.ndarray]: distance and rdf value for each species combination
         """
-        ase_atoms = self.get_ase_atoms()
-        pipeline = Pipeline(source = StaticSource(data=ase_to_ovito(ase_atoms)))
-        modifier = CoordinationAnalysisModifier(cutoff=rcut, number_of_bins=bins, partial=True)
-        pipeline.modifiers.append(modifier)
-        rdf_table = pipeline.compute().tables['coordination-rdf']
-        rdf_component_name = rdf_table.y.component_names
-        rdf_dict = {}
-        for i, name in enumerate(rdf_component_name):
-            if not "distance" in rdf_dict.keys():
-                rdf_dict["distance"] = rdf_table.xy()[:, 0]
-            rdf_dict[name] = rdf_table.y[:, i]
-        return rdf_dict
\ No newline at end of file
+        # local import: mlptools.analyzer.rdf -> mlptools.utils -> mlptools.atoms.atom
+        from mlptools.analyzer.rdf import RDFCalculator
+        return RDFCalculator(rcut=rcut, bins=bins).compute(self)
\ No newline at end of file
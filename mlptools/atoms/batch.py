@@ -0,0 +1,184 @@
+import numpy as np
+from typing import Iterator, List, Sequence, Union
+
+from mlptools.atoms.atom import MLPAtoms
+
+
+class AtomsBatch:
+    """N structures stored as concatenated per-atom arrays.
+
+    Atoms of structure i are rows offsets[i]:offsets[i+1] of positions, forces
+    and species. energy, cell and structure_id hold one entry per structure.
+    Dataset-wide quantities are computed with array operations instead of
+    loops over MLPAtoms. The force rows of structures without forces are NaN
+    (forces is None only if no structure has forces), as in HDF5AtomsStore.
+
+    Args:
+        positions (np.ndarray): (n_total_atoms, 3)
+        species (np.ndarray): (n_total_atoms,) chemical symbols
+        offsets (np.ndarray): (n_structures + 1,) start of every structure, offsets[0] == 0
+        energy (np.ndarray): (n_structures,)
+        cell (np.ndarray): (n_structures, 3, 3)
+        forces (np.ndarray, optional): (n_total_atoms, 3), NaN rows for structures without forces. Defaults to None.
+        structure_id (np.ndarray, optional): (n_structures,). Defaults to None.
+    """
+    def __init__(self, positions, species, offsets, energy, cell, forces=None, structure_id=None) -> None:
+        self.positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        self.species = np.asarray(species, dtype=str)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.energy = np.asarray(energy, dtype=float)
+        self.cell = np.asarray(cell, dtype=float).reshape(-1, 3, 3)
+        self.forces = None if forces is None else np.asarray(forces, dtype=float).reshape(-1, 3)
+        if structure_id is None:
+            structure_id = np.full(len(self.energy), None, dtype=object)
+        self.structure_id = np.asarray(structure_id, dtype=object)
+
+        if self.offsets[0] != 0 or self.offsets[-1] != len(self.positions):
+            raise ValueError("offsets must start at 0 and end at the number of atoms")
+        if not (len(self.energy) == len(self.cell) == len(self.structure_id) == len(self.offsets) - 1):
+            raise ValueError("per-structure arrays must have one entry per structure")
+        if len(self.species) != len(self.positions) or (self.forces is not None and len(self.forces) != len(self.positions)):
+            raise ValueError("per-atom arrays must have one row per atom")
+
+
+    @classmethod
+    def from_atoms(cls, all_atoms: Sequence[MLPAtoms]) -> "AtomsBatch":
+        all_atoms = list(all_atoms)
+        n_atoms = [len(atoms.coord) for atoms in all_atoms]
+        has_forces = any(atoms.force is not None for atoms in all_atoms)
+        return cls(
+            positions=np.concatenate([np.asarray(atoms.coord, dtype=float) for atoms in all_atoms]) if all_atoms else np.empty((0, 3)),
+            species=[s for atoms in all_atoms for s in atoms.get_chemical_symbols()],
+            offsets=np.concatenate([[0], np.cumsum(n_atoms, dtype=np.int64)]),
+            energy=[np.nan if atoms.energy is None else atoms.energy for atoms in all_atoms],
+            cell=np.array([np.asarray(atoms.cell, dtype=float).reshape(3, 3) for atoms in all_atoms]).reshape(-1, 3, 3),
+            forces=np.concatenate([
+                np.full((n, 3), np.nan) if atoms.force is None else np.asarray(atoms.force, dtype=float).reshape(-1, 3)
+                for atoms, n in zip(all_atoms, n_atoms)
+            ]) if has_forces else None,
+            structure_id=np.array([atoms.structure_id for atoms in all_atoms], dtype=object),
+        )
+
+
+    @classmethod
+    def concatenate(cls, batches: Sequence["AtomsBatch"]) -> "AtomsBatch":
+        batches = list(batches)
+        if len(batches) == 0:
+            raise ValueError("no batch to concatenate")
+        n_atoms_before = np.cumsum([0] + [len(batch.positions) for batch in batches[:-1]])
+        has_forces = any(batch.forces is not None for batch in batches)
+        return cls(
+            positions=np.concatenate([batch.positions for batch in batches]),
+            species=np.concatenate([batch.species for batch in batches]),
+            offsets=np.concatenate([[0]] + [batch.offsets[1:] + n for batch, n in zip(batches, n_atoms_before)]),
+            energy=np.concatenate([batch.energy for batch in batches]),
+            cell=np.concatenate([batch.cell for batch in batches]),
+            forces=np.concatenate([
+                np.full((len(batch.positions), 3), np.nan) if batch.forces is None else batch.forces for batch in batches
+            ]) if has_forces else None,
+            structure_id=np.concatenate([batch.structure_id for batch in batches]),
+        )
+
+
+    def __len__(self) -> int:
+        return len(self.energy)
+
+    @property
+    def n_atoms(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @property
+    def structure_index(self) -> np.ndarray:
+        """index of the structure of every atom
+        """
+        return np.repeat(np.arange(len(self)), self.n_atoms)
+
+
+    def get_volume(self) -> np.ndarray:
+        vol = np.einsum('ij,ij->i', self.cell[:, 0], np.cross(self.cell[:, 1], self.cell[:, 2]))
+        return np.round(vol, 3)
+
+    def get_atomic_energy(self) -> np.ndarray:
+        return self.energy / self.n_atoms
+
+    def get_atomic_volume(self) -> np.ndarray:
+        return self.get_volume() / self.n_atoms
+
+    def get_force_norms(self) -> np.ndarray:
+        """norm of the force on every atom (NaN for structures without forces)
+        """
+        if self.forces is None:
+            raise Exception('forces are not set')
+        return np.linalg.norm(self.forces, axis=1)
+
+    def get_max_force(self) -> np.ndarray:
+        """largest force norm of every structure (nan for structures without atoms or forces)
+        """
+        max_force = np.full(len(self), np.nan)
+        norms = self.get_force_norms()
+        not_empty = self.n_atoms > 0
+        if norms.size > 0:
+            max_force[not_empty] = np.maximum.reduceat(norms, self.offsets[:-1][not_empty])
+        return max_force
+
+
+    def select(self, indices: Union[slice, np.ndarray, List[int]]) -> "AtomsBatch":
+        """batch of the structures selected by a slice, an index array or a boolean mask
+        """
+        if isinstance(indices, slice) and indices.step in (None, 1):
+            # contiguous structures: per-atom arrays are views
+            start, stop, _ = indices.indices(len(self))
+            stop = max(start, stop)
+            atom_start, atom_stop = self.offsets[start], self.offsets[stop]
+            return AtomsBatch(
+                positions=self.positions[atom_start:atom_stop],
+                species=self.species[atom_start:atom_stop],
+                offsets=self.offsets[start:stop+1] - atom_start,
+                energy=self.energy[start:stop],
+                cell=self.cell[start:stop],
+                forces=None if self.forces is None else self.forces[atom_start:atom_stop],
+                structure_id=self.structure_id[start:stop],
+            )
+
+        indices = np.arange(len(self))[indices]
+        n_atoms = self.n_atoms[indices]
+        new_offsets = np.concatenate([[0], np.cumsum(n_atoms)])
+        # row of every selected atom: start of its structure + position within the structure
+        atom_index = np.repeat(self.offsets[indices] - new_offsets[:-1], n_atoms) + np.arange(new_offsets[-1])
+        return AtomsBatch(
+            positions=self.positions[atom_index],
+            species=self.species[atom_index],
+            offsets=new_offsets,
+            energy=self.energy[indices],
+            cell=self.cell[indices],
+            forces=None if self.forces is None else self.forces[atom_index],
+            structure_id=self.structure_id[indices],
+        )
+
+
+    def get_atoms(self, i: int) -> MLPAtoms:
+        i = int(np.arange(len(self))[i])
+        atom_slice = slice(self.offsets[i], self.offsets[i+1])
+        force = None if self.forces is None else self.forces[atom_slice]
+        return MLPAtoms(
+            cell=self.cell[i],
+            coord=self.positions[atom_slice],
+            energy=None if np.isnan(self.energy[i]) else float(self.energy[i]),
+            force=None if force is None or np.isnan(force).all() else force,
+            n_atoms=atom_slice.stop - atom_slice.start,
+            structure_id=self.structure_id[i],
+            symbols=self.species[atom_slice].tolist(),
+        )
+
+
+    def __getitem__(self, key: Union[int, slice, np.ndarray, List[int]]) -> Union[MLPAtoms, "AtomsBatch"]:
+        if np.isscalar(key):
+            return self.get_atoms(key)
+        return self.select(key)
+
+    def __iter__(self) -> Iterator[MLPAtoms]:
+        for i in range(len(self)):
+            yield self.get_atoms(i)
+
+    def to_atoms(self) -> List[MLPAtoms]:
+        return list(self)
@@ -51,4 +51,124 @@ def extract_atoms(
     if len(extracted_atoms) == 0:
         raise ValueError("No atoms were extracted")
 
-    return extracted_atoms
\ No newline at end of file
+    return extracted_atoms
+
+class AtomsExtractor():
+    """Batch extraction of boxes and spheres from a large structure.
+
+    Atoms are binned once into a grid over the fractional coordinates of the
+    cell, so each window only looks at the atoms in the grid cells it
+    overlaps. Triclinic cells and windows crossing the periodic boundary
+    (periodic images) are supported.
+
+    Args:
+        atoms (Atoms): ase atoms object (e.g. a snapshot of 10^5 atoms)
+        bin_size (float, optional): approximate edge length of a grid cell. Defaults to 4.0.
+    """
+    def __init__(self, atoms: Atoms, bin_size: float = 4.0) -> None:
+        self.atoms = atoms
+        self.cell = np.array(atoms.cell[:], dtype=float)
+        self.pbc = np.array(atoms.pbc, dtype=bool)
+        volume = abs(np.linalg.det(self.cell))
+        if volume < 1e-12:
+            raise ValueError("cell must not be singular")
+        self.inv_cell = np.linalg.inv(self.cell)
+
+        frac = atoms.positions @ self.inv_cell
+        frac[:, self.pbc] -= np.floor(frac[:, self.pbc])
+        self.positions = frac @ self.cell
+
+        # distances between opposite faces of the cell
+        heights = volume / np.linalg.norm(np.cross(self.cell[[1, 2, 0]], self.cell[[2, 0, 1]]), axis=1)
+        self.n_bins = np.maximum(1, (heights // bin_size).astype(int))
+        bin_idx = np.clip(np.floor(frac * self.n_bins).astype(int), 0, self.n_bins - 1)
+        flat_idx = np.ravel_multi_index(bin_idx.T, self.n_bins)
+        self.order = np.argsort(flat_idx, kind="stable")
+        self.counts = np.bincount(flat_idx, minlength=np.prod(self.n_bins))
+        self.starts = np.concatenate([[0], np.cumsum(self.counts)[:-1]])
+
+
+    def _get_candidates(self, frac_lower: np.ndarray, frac_upper: np.ndarray):
+        """indices and (image shifted) positions of the atoms in the grid cells overlapping a fractional range
+        """
+        lower = np.floor(frac_lower * self.n_bins).astype(int)
+        upper = np.floor(frac_upper * self.n_bins).astype(int)
+        # no periodic images along non periodic axes
+        lower = np.where(self.pbc, lower, np.clip(lower, 0, self.n_bins - 1))
+        upper = np.where(self.pbc, upper, np.clip(upper, 0, self.n_bins - 1))
+
+        grid = np.stack(np.meshgrid(*[np.arange(lower[k], upper[k] + 1) for k in range(3)], indexing="ij"), axis=-1).reshape(-1, 3)
+        image = np.floor_divide(grid, self.n_bins)
+        cell_idx = np.ravel_multi_index((grid - image * self.n_bins).T, self.n_bins)
+        counts = self.counts[cell_idx]
+        total = counts.sum()
+        # concatenate the ranges [starts, starts + counts) of every grid cell
+        positions_in_order = np.repeat(self.starts[cell_idx] - np.cumsum(counts) + counts, counts) + np.arange(total)
+        indices = self.order[positions_in_order]
+        positions = self.positions[indices] + np.repeat(image @ self.cell, counts, axis=0)
+        return indices, positions
+
+
+    def _build_atoms(self, indices: np.ndarray, positions: np.ndarray, cell: np.ndarray) -> Atoms:
+        extracted_atoms = self.atoms[indices]
+        extracted_atoms.set_positions(positions)
+        extracted_atoms.set_cell(cell)
+        return extracted_atoms
+
+
+    def extract_boxes(self, lower: np.ndarray, upper: np.ndarray) -> List[Atoms]:
+        """Extract atoms inside axis aligned (cartesian) boxes
+
+        Args:
+            lower (np.ndarray): (n_boxes, 3) lower corners
+            upper (np.ndarray): (n_boxes, 3) upper corners
+
+        Returns:
+            List[Atoms]: extracted atoms for each box. positions are relative to the lower corner
+                and the cell is the box. Empty Atoms if no atoms are inside.
+        """
+        lower = np.atleast_2d(np.asarray(lower, dtype=float))
+        upper = np.atleast_2d(np.asarray(upper, dtype=float))
+        if lower.shape != upper.shape:
+            raise ValueError("lower and upper must have the same shape")
+        if np.any(lower > upper):
+            raise ValueError("lower must be smaller than upper")
+
+        all_extracted_atoms = []
+        corner_selector = np.array(np.meshgrid([0, 1], [0, 1], [0, 1], indexing="ij")).reshape(3, -1).T
+        for box_lower, box_upper in zip(lower, upper):
+            corners = np.where(corner_selector, box_upper, box_lower)
+            frac_corners = corners @ self.inv_cell
+            indices, positions = self._get_candidates(frac_corners.min(axis=0), frac_corners.max(axis=0))
+            mask = np.all((positions > box_lower) & (positions < box_upper), axis=1)
+            all_extracted_atoms.append(self._build_atoms(indices[mask], positions[mask] - box_lower, np.diag(box_upper - box_lower)))
+        return all_extracted_atoms
+
+
+    def extract_spheres(self, centers: np.ndarray, radii: np.ndarray | float, vacuum: float = 0.0) -> List[Atoms]:
+        """Extract atoms inside spheres
+
+        Args:
+            centers (np.ndarray): (n_spheres, 3) cartesian centers
+            radii (np.ndarray | float): radius of each sphere or a common radius
+            vacuum (float, optional): added to the edge of the cubic cell of each cluster. Defaults to 0.0.
+
+        Returns:
+            List[Atoms]: extracted atoms for each sphere, centered in a cubic cell of 2 * radius + vacuum.
+                Empty Atoms if no atoms are inside.
+        """
+        centers = np.atleast_2d(np.asarray(centers, dtype=float))
+        radii = np.broadcast_to(np.asarray(radii, dtype=float), (len(centers),))
+        if np.any(radii <= 0):
+            raise ValueError("radii must be positive")
+
+        # half width of a sphere along each fractional axis
+        frac_half_widths = radii[:, None] * np.linalg.norm(self.inv_cell, axis=0)
+        all_extracted_atoms = []
+        for center, radius, frac_half_width in zip(centers, radii, frac_half_widths):
+            frac_center = center @ self.inv_cell
+            indices, positions = self._get_candidates(frac_center - frac_half_width, frac_center + frac_half_width)
+            mask = np.sum((positions - center)**2, axis=1) < radius**2
+            edge = 2 * radius + vacuum
+            all_extracted_atoms.append(self._build_atoms(indices[mask], positions[mask] - center + edge / 2, np.eye(3) * edge))
+        return all_extracted_atoms
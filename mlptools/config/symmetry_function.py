@@ -15,4 +15,5 @@ class AngularSymmetryFunctionConfig(BaseModel):
     zeta: float
     eta: float
     rcut: float
+    rs: float=0.0
     
\ No newline at end of file
@@ -8,7 +8,7 @@ import os
 import random
 from typing import List
 
-from mlptools.io.read import read_from_format
+from mlptools.io.read import read_many
 from mlptools.atoms.atom import MLPAtoms
 from mlptools.utils.constants import ZERO_POINT_ENERGY
 
@@ -28,13 +28,7 @@ def get_artificial_dimer(distance_lower_limit:float, distance_upper_limit:float,
 
     path2dimer = '/Users/y1u0d2/desktop/Lab/result/qe/Si/mp-149_dimer/coord/04/result'
 
-    all_atoms = []
-    for d in glob(f'{path2dimer}/scf*'):
-        try:
-            atoms = read_from_format(d, format='espresso-in')
-            all_atoms.append(atoms)
-        except:
-            continue
+    all_atoms = [atoms for atoms in read_many(glob(f'{path2dimer}/scf*'), format='espresso-in') if not isinstance(atoms, Exception)]
 
     print(f'Number of dimer atoms: {len(all_atoms)}')
 
@@ -0,0 +1,527 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+from ase import Atoms
+from ase.data import atomic_numbers
+
+from mlptools.analyzer.neighbor_list import get_neighbor_pairs
+from mlptools.analyzer.symmetry_function import SymmetryFunctionSettingReader, compile_sf_table
+from mlptools.config.symmetry_function import RadialSymmetryFunctionConfig, AngularSymmetryFunctionConfig
+from mlptools.utils.utils import imap_bounded
+
+
+def cutoff_function(r: np.ndarray, rcut: np.ndarray, cutoff_type: int = 1, cutoff_alpha: float = 0.0) -> np.ndarray:
+    """n2p2 cutoff function, 0 beyond rcut
+
+    Args:
+        r (np.ndarray): distances
+        rcut (np.ndarray): cutoff radii (broadcast with r)
+        cutoff_type (int, optional): 1: 0.5 * (cos(pi * x) + 1), 2: tanh^3(1 - r / rcut). Defaults to 1.
+        cutoff_alpha (float, optional): inner cutoff of type 1 as a fraction of rcut. Defaults to 0.0.
+
+    Returns:
+        np.ndarray: cutoff function values
+    """
+    if cutoff_type == 1:
+        rcut_inner = cutoff_alpha * rcut
+        x = (r - rcut_inner) / (rcut - rcut_inner)
+        fc = np.where(r < rcut_inner, 1.0, 0.5 * (np.cos(np.pi * x) + 1))
+    elif cutoff_type == 2:
+        fc = np.tanh(1 - r / rcut)**3
+    else:
+        raise ValueError(f"cutoff_type {cutoff_type} is not supported")
+    return np.where(r < rcut, fc, 0.0)
+
+
+def cutoff_function_derivative(r: np.ndarray, rcut: np.ndarray, cutoff_type: int = 1, cutoff_alpha: float = 0.0) -> np.ndarray:
+    """derivative of cutoff_function with respect to r, 0 beyond rcut
+
+    Args:
+        r (np.ndarray): distances
+        rcut (np.ndarray): cutoff radii (broadcast with r)
+        cutoff_type (int, optional): see cutoff_function. Defaults to 1.
+        cutoff_alpha (float, optional): see cutoff_function. Defaults to 0.0.
+
+    Returns:
+        np.ndarray: dfc/dr
+    """
+    if cutoff_type == 1:
+        rcut_inner = cutoff_alpha * rcut
+        x = (r - rcut_inner) / (rcut - rcut_inner)
+        dfc = np.where(r < rcut_inner, 0.0, -0.5 * np.pi * np.sin(np.pi * x) / (rcut - rcut_inner))
+    elif cutoff_type == 2:
+        tanh = np.tanh(1 - r / rcut)
+        dfc = -3 * tanh**2 * (1 - tanh**2) / rcut
+    else:
+        raise ValueError(f"cutoff_type {cutoff_type} is not supported")
+    return np.where(r < rcut, dfc, 0.0)
+
+
+def get_radial_sf_values(table: Dict[str, np.ndarray], r: np.ndarray, cutoff_type: int = 1, cutoff_alpha: float = 0.0) -> np.ndarray:
+    """radial symmetry functions of every row of a parameter table for a single neighbor at r
+
+    Args:
+        table (Dict[str, np.ndarray]): eta, rs and rcut arrays, e.g. a value of SymmetryFunctionSettingReader.get_radial_sf_table
+        r (np.ndarray): distances
+        cutoff_type (int, optional): see cutoff_function. Defaults to 1.
+        cutoff_alpha (float, optional): see cutoff_function. Defaults to 0.0.
+
+    Returns:
+        np.ndarray: (len(r), number of functions)
+    """
+    r = np.asarray(r, dtype=float).reshape(-1, 1)
+    return np.exp(-table["eta"] * (r - table["rs"])**2) * cutoff_function(r, table["rcut"], cutoff_type=cutoff_type, cutoff_alpha=cutoff_alpha)
+
+
+def get_angular_sf_values(table: Dict[str, np.ndarray], theta: np.ndarray, is_degree: bool = True) -> np.ndarray:
+    """angular part 2^(1 - zeta) * (1 + lambda * cos(theta))^zeta of every row of a parameter table
+
+    Args:
+        table (Dict[str, np.ndarray]): lambdas and zeta arrays, e.g. a value of SymmetryFunctionSettingReader.get_angular_sf_table
+        theta (np.ndarray): angles
+        is_degree (bool, optional): theta in degree. Defaults to True.
+
+    Returns:
+        np.ndarray: (len(theta), number of functions)
+    """
+    theta = np.asarray(theta, dtype=float).reshape(-1, 1)
+    if is_degree:
+        theta = np.radians(theta)
+    return 2**(1 - table["zeta"]) * np.maximum(1 + table["lambdas"] * np.cos(theta), 0.0)**table["zeta"]
+
+
+def get_structure_arrays(atoms) -> Tuple[np.ndarray, np.ndarray, List[str], np.ndarray]:
+    """positions, cell, chemical symbols and pbc of ase.Atoms or MLPAtoms (periodic)
+    """
+    if isinstance(atoms, Atoms):
+        return atoms.positions, atoms.cell[:], atoms.get_chemical_symbols(), atoms.pbc
+    return np.asarray(atoms.coord, dtype=float), np.asarray(atoms.cell, dtype=float).reshape(3, 3), atoms.get_chemical_symbols(), np.ones(3, dtype=bool)
+
+
+class SymmetryFunctionCalculator():
+    """Per-atom radial (G2) and angular (G3, narrow) symmetry functions of n2p2.
+
+    Pairs come from a periodic neighbor list and every (j, k) neighbor pair of
+    a central atom is enumerated at once, so all symmetry functions of an
+    element are evaluated as (pairs or triplets) x (functions) arrays.
+    Central atoms are processed in chunks to bound the memory of the triplets.
+
+    The columns of an element are ordered as n2p2 sorts them (radial before
+    angular, then rcut, eta, ... and the neighbor elements by atomic number),
+    which is the order of atomic-env.G and nnp-scaling.log.0000.
+
+    Args:
+        radial_configs (List[RadialSymmetryFunctionConfig] or Dict[str, Dict[str, np.ndarray]]): bond is
+            "<center>-<neighbor>", or the table of SymmetryFunctionSettingReader.get_radial_sf_table
+        angular_configs (List[AngularSymmetryFunctionConfig] or Dict[str, Dict[str, np.ndarray]]): bond is
+            "<center>-<neighbor1>-<neighbor2>", or the table of SymmetryFunctionSettingReader.get_angular_sf_table
+        cutoff_type (int, optional): see cutoff_function. Defaults to 1.
+        cutoff_alpha (float, optional): see cutoff_function. Defaults to 0.0.
+        columns (Dict[str, List[str]], optional): column name of each config, as "radial"/"angular" lists in the
+            order of the configs. Defaults to None (built from the parameters). Not used for tables.
+        chunk_size (int, optional): number of central atoms processed at once. Defaults to 256.
+    """
+    def __init__(
+            self,
+            radial_configs: Union[List[RadialSymmetryFunctionConfig], Dict[str, Dict[str, np.ndarray]]],
+            angular_configs: Union[List[AngularSymmetryFunctionConfig], Dict[str, Dict[str, np.ndarray]]],
+            cutoff_type: int = 1,
+            cutoff_alpha: float = 0.0,
+            columns: Dict[str, List[str]] = None,
+            chunk_size: int = 256
+        ) -> None:
+        self.cutoff_type = cutoff_type
+        self.cutoff_alpha = cutoff_alpha
+        self.chunk_size = chunk_size
+
+        if columns is None:
+            columns = {
+                "radial": [f"{c.bond}_2_{c.eta}_{c.rs}_{c.rcut}" for c in radial_configs if isinstance(c, RadialSymmetryFunctionConfig)],
+                "angular": [f"{c.bond}_3_{c.eta}_{c.lambdas}_{c.zeta}_{c.rcut}_{c.rs}" for c in angular_configs if isinstance(c, AngularSymmetryFunctionConfig)],
+            }
+        # parameter tables of each central element in the n2p2 order
+        radial_table = radial_configs if isinstance(radial_configs, dict) else compile_sf_table(self._get_config_table(radial_configs, columns["radial"]))
+        angular_table = angular_configs if isinstance(angular_configs, dict) else compile_sf_table(self._get_config_table(angular_configs, columns["angular"]))
+
+        elements = set(radial_table) | set(angular_table)
+        for center_table in list(radial_table.values()) + list(angular_table.values()):
+            for name in ("neighbor", "neighbor1", "neighbor2"):
+                elements.update(center_table.get(name, np.zeros(0, dtype=str)).tolist())
+        # element index follows the atomic number as in n2p2
+        self.elements = sorted(elements, key=lambda symbol: atomic_numbers[symbol])
+        element_idx = {symbol: i for i, symbol in enumerate(self.elements)}
+        def get_element_idx(symbols: np.ndarray) -> np.ndarray:
+            return np.array([element_idx[symbol] for symbol in symbols], dtype=int)
+
+        self.radial_params: Dict[str, Dict[str, np.ndarray]] = {}
+        self.angular_params: Dict[str, Dict[str, np.ndarray]] = {}
+        self.columns: Dict[str, List[str]] = {}
+        empty_table = {"rcut": np.zeros(0), "column": np.zeros(0, dtype=str)}
+        for symbol in self.elements:
+            table = radial_table.get(symbol, empty_table)
+            self.radial_params[symbol] = {
+                "rcut": table["rcut"], "eta": table.get("eta", np.zeros(0)), "rs": table.get("rs", np.zeros(0)),
+                "e1": get_element_idx(table.get("neighbor", [])),
+            }
+            radial_columns = table["column"].tolist()
+            table = angular_table.get(symbol, empty_table)
+            self.angular_params[symbol] = {
+                "rcut": table["rcut"], "eta": table.get("eta", np.zeros(0)), "zeta": table.get("zeta", np.zeros(0)),
+                "lambdas": table.get("lambdas", np.zeros(0)), "rs": table.get("rs", np.zeros(0)),
+                "e1": get_element_idx(table.get("neighbor1", [])), "e2": get_element_idx(table.get("neighbor2", [])),
+            }
+            self.columns[symbol] = radial_columns + table["column"].tolist()
+
+        self.rcut = max([params["rcut"].max() for params in list(self.radial_params.values()) + list(self.angular_params.values()) if len(params["rcut"]) > 0])
+
+
+    @staticmethod
+    def _get_config_table(configs: List, columns: List[str]) -> Dict[str, np.ndarray]:
+        """column arrays of the configs as read by SymmetryFunctionSettingReader
+        """
+        table = {"center": [], "neighbor": [], "neighbor1": [], "neighbor2": [], "column": list(columns)}
+        for config in configs:
+            symbols = config.bond.split("-")
+            table["center"].append(symbols[0])
+            if isinstance(config, AngularSymmetryFunctionConfig):
+                table["neighbor1"].append(symbols[1])
+                table["neighbor2"].append(symbols[2])
+                names = ["eta", "lambdas", "zeta", "rcut", "rs"]
+            else:
+                table["neighbor"].append(symbols[1])
+                names = ["eta", "rs", "rcut"]
+            for name in names:
+                table.setdefault(name, []).append(getattr(config, name))
+        return {name: np.array(values) for name, values in table.items() if len(values) == len(configs)}
+
+
+    @classmethod
+    def from_setting_reader(cls, reader: SymmetryFunctionSettingReader, chunk_size: int = 256) -> "SymmetryFunctionCalculator":
+        """build from the symmetry function tables and cutoff_type of input.nn
+
+        Args:
+            reader (SymmetryFunctionSettingReader): reader of input.nn
+            chunk_size (int, optional): number of central atoms processed at once. Defaults to 256.
+        """
+        cutoff_type, cutoff_alpha = reader.get_cutoff_type()
+        return cls(
+            radial_configs=reader.get_radial_sf_table(),
+            angular_configs=reader.get_angular_sf_table(),
+            cutoff_type=cutoff_type,
+            cutoff_alpha=cutoff_alpha,
+            chunk_size=chunk_size,
+        )
+
+
+    def get_number_of_sf(self, symbol: str) -> int:
+        return len(self.columns[symbol])
+
+
+    def _fc(self, r: np.ndarray, rcut: np.ndarray) -> np.ndarray:
+        """cutoff function of r (n, 1) for the rcut of each function, evaluated once per distinct rcut
+        """
+        rcut_unique, rcut_inverse = np.unique(rcut, return_inverse=True)
+        return cutoff_function(r, rcut_unique, cutoff_type=self.cutoff_type, cutoff_alpha=self.cutoff_alpha)[:, rcut_inverse]
+
+
+    def _get_sorted_pairs(self, atoms) -> Tuple[np.ndarray, ...]:
+        """element index of the atoms and the pairs (i, j, d, D) within rcut sorted by i,
+        with the start of the pairs of each central atom
+        """
+        positions, cell, symbols, pbc = get_structure_arrays(atoms)
+        element_idx = {symbol: i for i, symbol in enumerate(self.elements)}
+        unknown_symbols = set(symbols) - set(element_idx)
+        if len(unknown_symbols) > 0:
+            raise ValueError(f"No symmetry function for {unknown_symbols}")
+        types = np.array([element_idx[symbol] for symbol in symbols], dtype=int)
+
+        i, j, d, D = get_neighbor_pairs(positions, cell, self.rcut, pbc=pbc, quantities="ijdD")
+        order = np.argsort(i, kind="stable")
+        i, j, d, D = i[order], j[order], d[order], D[order]
+        pair_starts = np.searchsorted(i, np.arange(len(positions) + 1))
+        return types, i, j, d, D, pair_starts
+
+
+    def compute(self, atoms) -> Dict[str, np.ndarray]:
+        """symmetry functions of one structure
+
+        Args:
+            atoms: ase.Atoms or MLPAtoms
+
+        Returns:
+            Dict[str, np.ndarray]: (n_atoms of the element, n_sf of the element) for each element,
+                rows in the order of the atoms
+        """
+        types, i, j, d, D, pair_starts = self._get_sorted_pairs(atoms)
+        n_atoms = len(types)
+
+        G = np.zeros((n_atoms, max([self.get_number_of_sf(symbol) for symbol in self.elements])))
+        for chunk_start in range(0, n_atoms, self.chunk_size):
+            chunk_end = min(chunk_start + self.chunk_size, n_atoms)
+            pair_slice = slice(pair_starts[chunk_start], pair_starts[chunk_end])
+            self._add_chunk(G, types, i[pair_slice], j[pair_slice], d[pair_slice], D[pair_slice])
+
+        G_dict = {}
+        for k, symbol in enumerate(self.elements):
+            G_dict[symbol] = G[types == k, :self.get_number_of_sf(symbol)]
+        return G_dict
+
+
+    def _add_chunk(self, G: np.ndarray, types: np.ndarray, i: np.ndarray, j: np.ndarray, d: np.ndarray, D: np.ndarray) -> None:
+        """add the symmetry functions of the central atoms of the pairs (sorted by i) to G
+        """
+        triplet_first, triplet_second = self._get_triplets(i)
+        for k, symbol in enumerate(self.elements):
+            n_radial = len(self.radial_params[symbol]["rcut"])
+
+            # radial: (pairs, functions)
+            params = self.radial_params[symbol]
+            pair_mask = types[i] == k
+            if n_radial > 0 and pair_mask.any():
+                r = d[pair_mask, None]
+                values = np.exp(-params["eta"] * (r - params["rs"])**2) * self._fc(r, params["rcut"])
+                values *= types[j[pair_mask], None] == params["e1"]
+                np.add.at(G, (i[pair_mask], slice(0, n_radial)), values)
+
+            # angular: (triplets, functions)
+            params = self.angular_params[symbol]
+            triplet_mask = types[i[triplet_first]] == k
+            if len(params["rcut"]) == 0 or not triplet_mask.any():
+                continue
+            first, second = triplet_first[triplet_mask], triplet_second[triplet_mask]
+            r_jk = np.linalg.norm(D[second] - D[first], axis=1)
+            # triplets outside all the cutoffs of the element do not contribute
+            is_inside = (d[first] < params["rcut"].max()) & (d[second] < params["rcut"].max()) & (r_jk < params["rcut"].max())
+            first, second, r_jk = first[is_inside], second[is_inside], r_jk[is_inside, None]
+            r_ij = d[first, None]
+            r_ik = d[second, None]
+            cos_theta = np.sum(D[first] * D[second], axis=1)[:, None] / (r_ij * r_ik)
+            type_j = types[j[first], None]
+            type_k = types[j[second], None]
+            is_target = ((type_j == params["e1"]) & (type_k == params["e2"])) | ((type_j == params["e2"]) & (type_k == params["e1"]))
+            angular_term = np.maximum(1 + params["lambdas"] * cos_theta, 0.0)**params["zeta"]
+            radial_term = np.exp(-params["eta"] * ((r_ij - params["rs"])**2 + (r_ik - params["rs"])**2 + (r_jk - params["rs"])**2))
+            cutoff_term = self._fc(r_ij, params["rcut"]) * self._fc(r_ik, params["rcut"]) * self._fc(r_jk, params["rcut"])
+            values = 2**(1 - params["zeta"]) * angular_term * radial_term * cutoff_term * is_target
+            np.add.at(G, (i[first], slice(n_radial, n_radial + len(params["rcut"]))), values)
+
+
+    @staticmethod
+    def _get_triplets(i: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """pair indices (first, second), first < second, of every two neighbors of the same central atom (i sorted)
+        """
+        if len(i) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        group_starts = np.flatnonzero(np.r_[True, i[1:] != i[:-1]])
+        group_sizes = np.diff(np.r_[group_starts, len(i)])
+        position_in_group = np.arange(len(i)) - np.repeat(group_starts, group_sizes)
+        n_later = np.repeat(group_sizes, group_sizes) - position_in_group - 1
+        first = np.repeat(np.arange(len(i)), n_later)
+        second = first + 1 + np.arange(len(first)) - np.repeat(np.cumsum(n_later) - n_later, n_later)
+        return first, second
+
+
+    def _dfc(self, r: np.ndarray, rcut: np.ndarray) -> np.ndarray:
+        """derivative of the cutoff function, same layout as _fc
+        """
+        rcut_unique, rcut_inverse = np.unique(rcut, return_inverse=True)
+        return cutoff_function_derivative(r, rcut_unique, cutoff_type=self.cutoff_type, cutoff_alpha=self.cutoff_alpha)[:, rcut_inverse]
+
+
+    def compute_derivatives(self, atoms) -> Dict[str, Dict[str, np.ndarray]]:
+        """analytic derivatives of the symmetry functions with respect to the atomic positions
+
+        Only the non-zero blocks are returned: for a central atom i, the derivatives with respect
+        to its own position and to the positions of its neighbors a within rcut (periodic images of
+        the same atom are summed), i.e. a sparse (center, neighbor) list instead of N x N x 3.
+
+        Args:
+            atoms: ase.Atoms or MLPAtoms
+
+        Returns:
+            Dict[str, Dict[str, np.ndarray]]: for each element,
+                "center" (n_entries,): atom index of the central atom i,
+                "neighbor" (n_entries,): atom index a (a == i for the derivative by the own position),
+                "dGdr" (n_entries, n_sf of the element, 3): dG_i / dr_a.
+                Entries are sorted by (center, neighbor).
+        """
+        types, i, j, d, D, pair_starts = self._get_sorted_pairs(atoms)
+        n_atoms = len(types)
+
+        entry_list_dict = {symbol: [] for symbol in self.elements}
+        for chunk_start in range(0, n_atoms, self.chunk_size):
+            chunk_end = min(chunk_start + self.chunk_size, n_atoms)
+            pair_slice = slice(pair_starts[chunk_start], pair_starts[chunk_end])
+            chunk_entries = self._get_derivative_chunk(
+                types, np.arange(chunk_start, chunk_end), i[pair_slice], j[pair_slice], d[pair_slice], D[pair_slice]
+            )
+            for symbol, entries in chunk_entries.items():
+                entry_list_dict[symbol].append(entries)
+
+        derivative_dict = {}
+        for symbol, entry_list in entry_list_dict.items():
+            if len(entry_list) == 0:
+                entry_list = [(np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros((0, self.get_number_of_sf(symbol), 3)))]
+            derivative_dict[symbol] = {
+                name: np.concatenate([entries[k] for entries in entry_list])
+                for k, name in enumerate(["center", "neighbor", "dGdr"])
+            }
+        return derivative_dict
+
+
+    def _get_derivative_chunk(
+            self, types: np.ndarray, centers: np.ndarray, i: np.ndarray, j: np.ndarray, d: np.ndarray, D: np.ndarray
+        ) -> Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """(center, neighbor, dGdr) of the central atoms of a chunk and their pairs (sorted by i)
+        """
+        n_atoms = len(types)
+        triplet_first, triplet_second = self._get_triplets(i)
+        unit = D / d[:, None]
+
+        chunk_entries = {}
+        for k, symbol in enumerate(self.elements):
+            element_centers = centers[types[centers] == k]
+            if len(element_centers) == 0:
+                continue
+            # one entry per (i, a) with a = i or a neighbor of i
+            pair_mask = types[i] == k
+            pair_keys = i * n_atoms + j
+            keys = np.unique(np.r_[element_centers * n_atoms + element_centers, pair_keys[pair_mask]])
+            pair_entry = np.searchsorted(keys, pair_keys)
+            self_entry = np.searchsorted(keys, i * n_atoms + i)
+            dGdr = np.zeros((len(keys), self.get_number_of_sf(symbol), 3))
+            n_radial = len(self.radial_params[symbol]["rcut"])
+
+            # radial: dG_i/dr_j = dg/dr * u_ij and dG_i/dr_i = -dg/dr * u_ij
+            params = self.radial_params[symbol]
+            if n_radial > 0 and pair_mask.any():
+                r = d[pair_mask, None]
+                dgdr = np.exp(-params["eta"] * (r - params["rs"])**2) * (
+                    self._dfc(r, params["rcut"]) - 2 * params["eta"] * (r - params["rs"]) * self._fc(r, params["rcut"])
+                )
+                dgdr *= types[j[pair_mask], None] == params["e1"]
+                contribution = dgdr[:, :, None] * unit[pair_mask, None, :]
+                np.add.at(dGdr, (pair_entry[pair_mask], slice(0, n_radial)), contribution)
+                np.add.at(dGdr, (self_entry[pair_mask], slice(0, n_radial)), -contribution)
+
+            # angular: the term of (j, k) is A(cos_theta) * P(r_ij, r_ik, r_jk)
+            params = self.angular_params[symbol]
+            triplet_mask = types[i[triplet_first]] == k
+            if len(params["rcut"]) > 0 and triplet_mask.any():
+                first, second = triplet_first[triplet_mask], triplet_second[triplet_mask]
+                D_jk = D[second] - D[first]
+                r_jk = np.linalg.norm(D_jk, axis=1)
+                is_inside = (d[first] < params["rcut"].max()) & (d[second] < params["rcut"].max()) & (r_jk < params["rcut"].max())
+                first, second, D_jk, r_jk = first[is_inside], second[is_inside], D_jk[is_inside], r_jk[is_inside, None]
+                r_ij = d[first, None]
+                r_ik = d[second, None]
+                u_ij, u_ik, u_jk = unit[first], unit[second], D_jk / r_jk
+                cos_theta = np.sum(u_ij * u_ik, axis=1)[:, None]
+                type_j = types[j[first], None]
+                type_k = types[j[second], None]
+                is_target = ((type_j == params["e1"]) & (type_k == params["e2"])) | ((type_j == params["e2"]) & (type_k == params["e1"]))
+
+                base = np.maximum(1 + params["lambdas"] * cos_theta, 0.0)
+                angular_term = 2**(1 - params["zeta"]) * base**params["zeta"]
+                dangular_term = np.where(
+                    base > 0, 2**(1 - params["zeta"]) * params["zeta"] * params["lambdas"] * base**(params["zeta"] - 1), 0.0
+                )
+                radial_term = np.exp(-params["eta"] * ((r_ij - params["rs"])**2 + (r_ik - params["rs"])**2 + (r_jk - params["rs"])**2)) * is_target
+                fc_ij, fc_ik, fc_jk = self._fc(r_ij, params["rcut"]), self._fc(r_ik, params["rcut"]), self._fc(r_jk, params["rcut"])
+                # dP/dr of each distance
+                dP_ij = radial_term * fc_ik * fc_jk * (self._dfc(r_ij, params["rcut"]) - 2 * params["eta"] * (r_ij - params["rs"]) * fc_ij)
+                dP_ik = radial_term * fc_ij * fc_jk * (self._dfc(r_ik, params["rcut"]) - 2 * params["eta"] * (r_ik - params["rs"]) * fc_ik)
+                dP_jk = radial_term * fc_ij * fc_ik * (self._dfc(r_jk, params["rcut"]) - 2 * params["eta"] * (r_jk - params["rs"]) * fc_jk)
+                dAP = dangular_term * radial_term * fc_ij * fc_ik * fc_jk
+
+                # dcos_theta/dr_j and dcos_theta/dr_k
+                dcos_j = (u_ik - cos_theta * u_ij) / r_ij
+                dcos_k = (u_ij - cos_theta * u_ik) / r_ik
+                angular_slice = slice(n_radial, n_radial + len(params["rcut"]))
+                for x in range(3):
+                    dTdr_j = dAP * dcos_j[:, x, None] + angular_term * (dP_ij * u_ij[:, x, None] - dP_jk * u_jk[:, x, None])
+                    dTdr_k = dAP * dcos_k[:, x, None] + angular_term * (dP_ik * u_ik[:, x, None] + dP_jk * u_jk[:, x, None])
+                    np.add.at(dGdr, (pair_entry[first], angular_slice, x), dTdr_j)
+                    np.add.at(dGdr, (pair_entry[second], angular_slice, x), dTdr_k)
+                    np.add.at(dGdr, (self_entry[first], angular_slice, x), -(dTdr_j + dTdr_k))
+
+            chunk_entries[symbol] = (keys // n_atoms, keys % n_atoms, dGdr)
+        return chunk_entries
+
+
+    def iter_derivatives(self, all_atoms: Iterable, workers: int = 1) -> Iterator[Dict[str, Dict[str, np.ndarray]]]:
+        """compute_derivatives of many structures, yielded one by one in the input order
+
+        Args:
+            all_atoms (Iterable): ase.Atoms or MLPAtoms
+            workers (int, optional): number of processes. Defaults to 1.
+        """
+        if workers == 1:
+            for atoms in all_atoms:
+                yield self.compute_derivatives(atoms)
+            return
+
+        structure_arrays = (get_structure_arrays(atoms) for atoms in all_atoms)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from imap_bounded(executor, self._compute_derivatives_from_arrays, structure_arrays, 4 * workers)
+
+
+    def _compute_derivatives_from_arrays(self, arrays: Tuple) -> Dict[str, Dict[str, np.ndarray]]:
+        positions, cell, symbols, pbc = arrays
+        return self.compute_derivatives(Atoms(symbols=symbols, positions=positions, cell=cell, pbc=pbc))
+
+
+    def compute_many(self, all_atoms: Iterable, workers: int = 1) -> Dict[str, np.ndarray]:
+        """symmetry functions of many structures, rows concatenated in the order of the structures and atoms
+
+        Args:
+            all_atoms (Iterable): ase.Atoms or MLPAtoms
+            workers (int, optional): number of processes. Defaults to 1.
+
+        Returns:
+            Dict[str, np.ndarray]: same layout as compute
+        """
+        G_list_dict = {symbol: [] for symbol in self.elements}
+        for _, G_dict in self._iter_compute(all_atoms, workers=workers):
+            for symbol, G in G_dict.items():
+                G_list_dict[symbol].append(G)
+        return {
+            symbol: np.concatenate(G_list) if len(G_list) > 0 else np.zeros((0, self.get_number_of_sf(symbol)))
+            for symbol, G_list in G_list_dict.items()
+        }
+
+
+    def _iter_compute(self, all_atoms: Iterable, workers: int = 1) -> Iterator[Tuple[List[str], Dict[str, np.ndarray]]]:
+        if workers == 1:
+            for atoms in all_atoms:
+                yield get_structure_arrays(atoms)[2], self.compute(atoms)
+            return
+
+        structure_arrays = (get_structure_arrays(atoms) for atoms in all_atoms)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from imap_bounded(executor, self._compute_from_arrays, structure_arrays, 4 * workers)
+
+
+    def _compute_from_arrays(self, arrays: Tuple) -> Tuple[List[str], Dict[str, np.ndarray]]:
+        positions, cell, symbols, pbc = arrays
+        return symbols, self.compute(Atoms(symbols=symbols, positions=positions, cell=cell, pbc=pbc))
+
+
+    def write_atomic_env(self, all_atoms: Iterable, path2output: str, workers: int = 1) -> None:
+        """write the symmetry functions in the format of n2p2 atomic-env.G
+
+        Args:
+            all_atoms (Iterable): ase.Atoms or MLPAtoms
+            path2output (str): path to atomic-env.G
+            workers (int, optional): number of processes. Defaults to 1.
+        """
+        with open(path2output, mode="w") as f:
+            for symbols, G_dict in self._iter_compute(all_atoms, workers=workers):
+                row_idx = {symbol: 0 for symbol in G_dict}
+                lines = []
+                for symbol in symbols:
+                    values = G_dict[symbol][row_idx[symbol]]
+                    row_idx[symbol] += 1
+                    lines.append(f"{symbol:>2s}" + "".join(f" {value:16.8E}" for value in values) + "\n")
+                f.writelines(lines)
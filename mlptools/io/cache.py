@@ -0,0 +1,170 @@
+import os
+import hashlib
+import numpy as np
+from typing import Dict, Optional
+
+from mlptools.utils.utils import get_file_signature
+
+
+class ParseCache():
+    """On-disk cache of parsed DFT outputs.
+
+    Each entry is an uncompressed .npz holding cell, positions, forces, energy,
+    total magnetization, symbols and validation flags. Entries are keyed by the
+    absolute path, size and mtime of the output file (and optionally a hash of
+    its content), so a modified file is simply a cache miss. When the cache
+    grows beyond max_size bytes the least recently used entries are removed.
+
+    Args:
+        cache_dir (str, optional): where to store entries. Defaults to $MLPTOOLS_CACHE_DIR
+            or ~/.cache/mlptools/parse.
+        max_size (int, optional): size cap in bytes. Defaults to 2 GB.
+        use_content_hash (bool, optional): also key on the sha1 of the file content. Defaults to False.
+    """
+    DEFAULT_MAX_SIZE = 2 * 1024**3
+    FLAG_NAMES = ['job_done', 'convergence_not_achieved', 'large_scf_correction']
+
+    def __init__(self, cache_dir:str=None, max_size:int=DEFAULT_MAX_SIZE, use_content_hash:bool=False) -> None:
+        if cache_dir is None:
+            cache_dir = os.environ.get(
+                'MLPTOOLS_CACHE_DIR',
+                os.path.join(os.path.expanduser('~'), '.cache', 'mlptools', 'parse')
+            )
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.use_content_hash = use_content_hash
+        self._size = None
+
+
+    def get_key(self, path:str) -> str:
+        size, mtime_ns = get_file_signature(path)
+        key = hashlib.sha1(f'{os.path.abspath(path)}\0{size}\0{mtime_ns}'.encode())
+        if self.use_content_hash:
+            with open(path, mode='rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    key.update(chunk)
+        return key.hexdigest()
+
+
+    def get_entry_path(self, key:str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f'{key}.npz')
+
+
+    def load(self, path:str) -> Optional[Dict]:
+        """parsed result of path, or None on a cache miss
+        """
+        path2entry = self.get_entry_path(self.get_key(path))
+        try:
+            with np.load(path2entry, allow_pickle=False) as entry:
+                total_magnetization = float(entry['total_magnetization'])
+                parsed = {
+                    'cell': entry['cell'],
+                    'symbols': entry['symbols'].tolist(),
+                    'positions': entry['positions'],
+                    'energy': float(entry['energy']),
+                    'forces': entry['forces'],
+                    'total_magnetization': None if np.isnan(total_magnetization) else total_magnetization,
+                    'flags': dict(zip(self.FLAG_NAMES, entry['flags'].tolist())),
+                }
+        except (OSError, KeyError, ValueError):
+            return None
+        # mark as recently used for the LRU eviction
+        try:
+            os.utime(path2entry)
+        except OSError:
+            pass
+        return parsed
+
+
+    def save(self, path:str, parsed:Dict) -> None:
+        path2entry = self.get_entry_path(self.get_key(path))
+        total_magnetization = parsed['total_magnetization']
+        try:
+            os.makedirs(os.path.dirname(path2entry), exist_ok=True)
+            # write to a temporary file first so that concurrent readers never see a partial entry
+            path2tmp = f'{path2entry}.{os.getpid()}.tmp'
+            with open(path2tmp, mode='wb') as f:
+                np.savez(
+                    f,
+                    cell=np.asarray(parsed['cell'], dtype=float),
+                    symbols=np.array(parsed['symbols'], dtype=str),
+                    positions=np.asarray(parsed['positions'], dtype=float),
+                    energy=np.float64(parsed['energy']),
+                    forces=np.asarray(parsed['forces'], dtype=float),
+                    total_magnetization=np.float64(np.nan if total_magnetization is None else total_magnetization),
+                    flags=np.array([parsed['flags'][name] for name in self.FLAG_NAMES], dtype=bool),
+                )
+            # size of the entry being overwritten, so that it is not counted twice
+            replaced_size = os.path.getsize(path2entry) if os.path.exists(path2entry) else 0
+            os.replace(path2tmp, path2entry)
+        except OSError as e:
+            print(f'WARNING: could not write parse cache entry {path2entry}: {e}')
+            return
+
+        if self._size is None:
+            self._size = self.get_size()
+        else:
+            self._size += os.path.getsize(path2entry) - replaced_size
+        if self._size > self.max_size:
+            self.evict()
+
+
+    def _entries(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for filename in files:
+                if not filename.endswith('.npz'):
+                    continue
+                path2entry = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path2entry)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path2entry))
+        return entries
+
+
+    def get_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+
+    def evict(self, target_size:int=None) -> None:
+        """remove least recently used entries until the cache is below target_size (default 90% of max_size)
+        """
+        target_size = int(0.9 * self.max_size) if target_size is None else target_size
+        entries = sorted(self._entries())
+        size = sum(size for _, size, _ in entries)
+        for _, entry_size, path2entry in entries:
+            if size <= target_size:
+                break
+            try:
+                os.remove(path2entry)
+            except OSError:
+                continue
+            size -= entry_size
+        self._size = size
+
+
+    def clear(self) -> None:
+        self.evict(target_size=0)
+
+
+_default_cache = None
+
+def get_default_cache() -> Optional[ParseCache]:
+    """cache used by PWscfParser(use_cache=True). Disabled when $MLPTOOLS_PARSE_CACHE is 0
+    """
+    global _default_cache
+    if _default_cache is None and os.environ.get('MLPTOOLS_PARSE_CACHE', '1') != '0':
+        _default_cache = ParseCache()
+    return _default_cache
+
+
+def set_default_cache(cache:Optional[ParseCache]) -> None:
+    """replace the cache used by PWscfParser, e.g. to change its directory or size cap
+
+    This only affects the current process: worker processes started with spawn (macOS, Windows)
+    fall back to $MLPTOOLS_CACHE_DIR or ~/.cache. Pass the cache to read_many(cache=...) instead.
+    """
+    global _default_cache
+    _default_cache = cache
@@ -0,0 +1,233 @@
+import os
+import pickle
+import h5py
+import numpy as np
+from glob import glob
+from typing import Dict, Iterable, Iterator, List, Union
+
+from ase import Atoms
+from ase.data import atomic_numbers, chemical_symbols
+
+from mlptools.atoms.atom import MLPAtoms
+from mlptools.atoms.batch import AtomsBatch
+
+
+def write_hdf5(
+        all_atoms: Iterable[MLPAtoms],
+        path2h5: str,
+        chunk_size: int = 4096,
+        compression: str = None
+    ) -> int:
+    """Write structures to a single columnar HDF5 file.
+
+    Per-atom data is concatenated over all structures:
+        positions, forces (n_total_atoms, 3), species (n_total_atoms,) atomic numbers
+    Per-structure data:
+        offsets (n_structures + 1,): atoms of structure i are offsets[i]:offsets[i+1]
+        energy, total_magnetization (n_structures,), cell (n_structures, 3, 3),
+        structure_id, path (n_structures,) strings
+
+    Structures are buffered and appended chunk_size at a time, so memory use does not
+    depend on the number of structures.
+
+    Args:
+        all_atoms (Iterable[MLPAtoms]): structures to write
+        path2h5 (str): output file
+        chunk_size (int, optional): number of structures appended at once. Defaults to 4096.
+        compression (str, optional): h5py compression filter, e.g. "gzip" or "lzf". Defaults to None.
+
+    Returns:
+        int: number of structures written
+    """
+    string_dtype = h5py.string_dtype()
+    with h5py.File(path2h5, mode="w") as f:
+        atom_chunk = (max(chunk_size * 16, 1024), 3)
+        f.create_dataset("positions", shape=(0, 3), maxshape=(None, 3), dtype=np.float64, chunks=atom_chunk, compression=compression)
+        f.create_dataset("forces", shape=(0, 3), maxshape=(None, 3), dtype=np.float64, chunks=atom_chunk, compression=compression)
+        f.create_dataset("species", shape=(0,), maxshape=(None,), dtype=np.uint8, chunks=atom_chunk[:1], compression=compression)
+        f.create_dataset("offsets", data=np.zeros(1, dtype=np.int64), maxshape=(None,), chunks=(chunk_size,))
+        f.create_dataset("energy", shape=(0,), maxshape=(None,), dtype=np.float64, chunks=(chunk_size,), compression=compression)
+        f.create_dataset("total_magnetization", shape=(0,), maxshape=(None,), dtype=np.float64, chunks=(chunk_size,), compression=compression)
+        f.create_dataset("cell", shape=(0, 3, 3), maxshape=(None, 3, 3), dtype=np.float64, chunks=(chunk_size, 3, 3), compression=compression)
+        f.create_dataset("structure_id", shape=(0,), maxshape=(None,), dtype=string_dtype, chunks=(chunk_size,), compression=compression)
+        f.create_dataset("path", shape=(0,), maxshape=(None,), dtype=string_dtype, chunks=(chunk_size,), compression=compression)
+
+        def _append(name, values):
+            dataset = f[name]
+            n = dataset.shape[0]
+            dataset.resize(n + len(values), axis=0)
+            dataset[n:] = values
+
+        def _flush(buffer):
+            if len(buffer) == 0:
+                return
+            n_atoms = np.array([len(atoms.coord) for atoms in buffer], dtype=np.int64)
+            _append("positions", np.concatenate([np.asarray(atoms.coord, dtype=float) for atoms in buffer]))
+            _append("forces", np.concatenate([
+                np.full((len(atoms.coord), 3), np.nan) if atoms.force is None else np.asarray(atoms.force, dtype=float)
+                for atoms in buffer
+            ]))
+            _append("species", np.array([atomic_numbers[s] for atoms in buffer for s in atoms.get_chemical_symbols()], dtype=np.uint8))
+            _append("offsets", f["offsets"][-1] + np.cumsum(n_atoms))
+            _append("energy", np.array([np.nan if atoms.energy is None else atoms.energy for atoms in buffer], dtype=float))
+            _append("total_magnetization", np.array([
+                np.nan if atoms.total_magnetization is None else atoms.total_magnetization for atoms in buffer
+            ], dtype=float))
+            _append("cell", np.array([np.asarray(atoms.cell, dtype=float).reshape(3, 3) for atoms in buffer]))
+            _append("structure_id", ["" if atoms.structure_id is None else str(atoms.structure_id) for atoms in buffer])
+            _append("path", ["" if atoms.path is None else str(atoms.path) for atoms in buffer])
+
+        buffer = []
+        n_written = 0
+        for atoms in all_atoms:
+            buffer.append(atoms)
+            if len(buffer) == chunk_size:
+                _flush(buffer)
+                n_written += len(buffer)
+                buffer = []
+        _flush(buffer)
+        n_written += len(buffer)
+    return n_written
+
+
+class HDF5AtomsStore():
+    """Reader of files written by write_hdf5.
+
+    Per-structure columns are loaded on open. Indexing with a slice reads the
+    per-atom data of all selected structures in one contiguous read.
+
+    Args:
+        path2h5 (str): path to the HDF5 file
+    """
+    ITER_CHUNK_SIZE = 4096
+
+    def __init__(self, path2h5: str) -> None:
+        if not os.path.exists(path2h5):
+            raise FileNotFoundError(f"{path2h5} does not exist")
+        self.path2h5 = path2h5
+        with h5py.File(path2h5, mode="r") as f:
+            self.offsets = f["offsets"][:]
+            self.energy = f["energy"][:]
+            self.total_magnetization = f["total_magnetization"][:]
+            self.cell = f["cell"][:]
+            self.structure_id = f["structure_id"].asstr()[:]
+            self.path = f["path"].asstr()[:]
+        self.n_atoms = np.diff(self.offsets)
+
+
+    def __len__(self) -> int:
+        return len(self.energy)
+
+
+    def read_arrays(self, start: int = 0, stop: int = None) -> Dict[str, np.ndarray]:
+        """per-atom arrays (positions, forces, species) of structures start:stop
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        stop = max(start, stop)
+        atom_start, atom_stop = self.offsets[start], self.offsets[stop]
+        with h5py.File(self.path2h5, mode="r") as f:
+            return {
+                "positions": f["positions"][atom_start:atom_stop],
+                "forces": f["forces"][atom_start:atom_stop],
+                "species": f["species"][atom_start:atom_stop],
+                "offsets": self.offsets[start:stop+1] - atom_start,
+            }
+
+
+    def read_batch(self, start: int = 0, stop: int = None) -> AtomsBatch:
+        """structures start:stop as an AtomsBatch, without building MLPAtoms
+
+        forces of the structures without forces are NaN (None if no structure has forces)
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        stop = max(start, stop)
+        arrays = self.read_arrays(start, stop)
+        forces = arrays["forces"]
+        return AtomsBatch(
+            positions=arrays["positions"],
+            species=np.array(chemical_symbols)[arrays["species"]],
+            offsets=arrays["offsets"],
+            energy=self.energy[start:stop],
+            cell=self.cell[start:stop],
+            # rows of structures without forces stay NaN, as _build_atoms gives them force=None
+            forces=None if np.isnan(forces).all() else forces,
+            structure_id=np.array([sid or None for sid in self.structure_id[start:stop]], dtype=object),
+        )
+
+
+    def _build_atoms(self, i: int, arrays: Dict[str, np.ndarray], j: int) -> MLPAtoms:
+        atom_slice = slice(arrays["offsets"][j], arrays["offsets"][j+1])
+        force = arrays["forces"][atom_slice]
+        energy = self.energy[i]
+        total_magnetization = self.total_magnetization[i]
+        return MLPAtoms(
+            cell=self.cell[i],
+            coord=arrays["positions"][atom_slice],
+            force=None if np.isnan(force).all() else force,
+            energy=None if np.isnan(energy) else float(energy),
+            n_atoms=int(self.n_atoms[i]),
+            total_magnetization=None if np.isnan(total_magnetization) else float(total_magnetization),
+            structure_id=self.structure_id[i] or None,
+            symbols=[chemical_symbols[z] for z in arrays["species"][atom_slice].tolist()],
+            path=self.path[i] or None,
+        )
+
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[MLPAtoms, List[MLPAtoms]]:
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            arrays = self.read_arrays(start, stop)
+            return [self._build_atoms(i, arrays, j) for j, i in enumerate(range(start, max(start, stop)))]
+        i = int(np.arange(len(self))[key])
+        return self._build_atoms(i, self.read_arrays(i, i + 1), 0)
+
+
+    def __iter__(self) -> Iterator[MLPAtoms]:
+        for start in range(0, len(self), self.ITER_CHUNK_SIZE):
+            yield from self[start:start + self.ITER_CHUNK_SIZE]
+
+
+def migrate_pickle_tree(
+        path2data: str,
+        path2h5: str,
+        pickle_name: str = "atoms.pkl",
+        chunk_size: int = 4096,
+        compression: str = None
+    ) -> int:
+    """Collect <path2data>/*/<pickle_name> into one HDF5 file written by write_hdf5.
+
+    The pickles may hold MLPAtoms or ase.Atoms. The dir of each pickle is stored in the path column.
+
+    Args:
+        path2data (str): root of the pickle tree
+        path2h5 (str): output file
+        pickle_name (str, optional): name of the pickle in each dir. Defaults to "atoms.pkl".
+        chunk_size (int, optional): passed to write_hdf5. Defaults to 4096.
+        compression (str, optional): passed to write_hdf5. Defaults to None.
+
+    Returns:
+        int: number of structures written
+    """
+    def _iter_pickles():
+        for i, path2pkl in enumerate(sorted(glob(os.path.join(path2data, "*", pickle_name)))):
+            if i % 1000 == 0:
+                print(f"Migrating {i}th atom")
+            with open(path2pkl, "rb") as f:
+                atoms = pickle.load(f)
+            if isinstance(atoms, Atoms):
+                has_calculator = atoms.calc is not None
+                atoms = MLPAtoms(
+                    cell=atoms.cell[:],
+                    coord=atoms.positions,
+                    force=atoms.get_forces() if has_calculator else None,
+                    energy=atoms.get_potential_energy() if has_calculator else None,
+                    n_atoms=len(atoms),
+                    symbols=atoms.get_chemical_symbols(),
+                )
+            if atoms.path is None:
+                atoms.path = os.path.dirname(path2pkl)
+            yield atoms
+
+    return write_hdf5(_iter_pickles(), path2h5, chunk_size=chunk_size, compression=compression)
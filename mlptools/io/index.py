@@ -0,0 +1,287 @@
+import os
+import numpy as np
+from abc import ABC, abstractmethod
+from collections import deque
+from itertools import islice
+from typing import Dict, Iterator, List, Union
+
+from mlptools.atoms.atom import MLPAtoms
+from mlptools.io.read import _parse_n2p2_block, _read_lmp_dump_frame
+from mlptools.utils.utils import get_file_signature, open_file, resolve_compressed_path
+
+
+class SidecarIndex(ABC):
+    """Index of a data file stored next to it as ``<filename>.idx.npz``.
+
+    The arrays listed in ARRAY_NAMES are saved together with the size and mtime
+    of the data file, and the index is rebuilt when they no longer match.
+    Compressed data files are supported, but seeking in them means
+    decompressing from the start of the file, so random access is slow.
+    """
+    INDEX_SUFFIX = ".idx.npz"
+    ARRAY_NAMES: List[str] = []
+
+    def __init__(self, path2data:str, path2index:str=None, rebuild:bool=False) -> None:
+        path2data = resolve_compressed_path(path2data)
+        if not os.path.exists(path2data):
+            raise FileNotFoundError(f"{path2data} does not exist")
+        self.path2data = path2data
+        self.path2index = path2data + self.INDEX_SUFFIX if path2index is None else path2index
+
+        if rebuild or not self.load():
+            self.build()
+            self.signature = np.array(get_file_signature(self.path2data), dtype=np.int64)
+            self.save()
+
+
+    @abstractmethod
+    def build(self) -> None:
+        """scan the data file once and set the arrays in ARRAY_NAMES
+        """
+        raise NotImplementedError()
+
+
+    def save(self) -> None:
+        arrays = {name: getattr(self, name) for name in self.ARRAY_NAMES}
+        try:
+            with open(self.path2index, mode="wb") as f:
+                np.savez(f, signature=self.signature, **arrays)
+        except OSError as e:
+            print(f"WARNING: could not write index file {self.path2index}: {e}")
+
+
+    def load(self) -> bool:
+        """load the sidecar index
+
+        Returns:
+            bool: False if the index does not exist or the data file has changed
+        """
+        if not os.path.exists(self.path2index):
+            return False
+        with np.load(self.path2index, allow_pickle=False) as index:
+            signature = index["signature"]
+            if tuple(signature) != get_file_signature(self.path2data):
+                return False
+            if any(name not in index.files for name in self.ARRAY_NAMES):
+                return False
+            for name in self.ARRAY_NAMES:
+                setattr(self, name, index[name])
+        self.signature = signature
+        return True
+
+
+class N2p2DataIndex(SidecarIndex):
+    """Byte-offset index for random access into n2p2 input.data.
+
+    Records the byte offset, number of atoms, structure_id (from the comment
+    line) and energy of every block.
+    """
+    ARRAY_NAMES = ["offsets", "n_atoms", "structure_ids", "energies"]
+
+    def __init__(self, path2target:str, data_filename:str="input.data", path2index:str=None, rebuild:bool=False) -> None:
+        self._id_to_positions = None
+        super().__init__(os.path.join(path2target, data_filename), path2index=path2index, rebuild=rebuild)
+
+
+    def build(self) -> None:
+        offsets = []
+        n_atoms = []
+        structure_ids = []
+        energies = []
+        with open_file(self.path2data, mode="rb") as f:
+            offset = 0
+            block_offset = None
+            for line in f:
+                stripped = line.strip()
+                if stripped == b"begin":
+                    block_offset = offset
+                    block_n_atoms = 0
+                    block_id = ""
+                    block_energy = np.nan
+                elif block_offset is None:
+                    pass
+                elif stripped.startswith(b"atom"):
+                    block_n_atoms += 1
+                elif stripped.startswith(b"comment"):
+                    comment = stripped.split()
+                    block_id = comment[1].decode() if len(comment) > 1 else ""
+                elif stripped.startswith(b"energy"):
+                    block_energy = float(stripped.split()[-1])
+                elif stripped == b"end":
+                    offsets.append(block_offset)
+                    n_atoms.append(block_n_atoms)
+                    structure_ids.append(block_id)
+                    energies.append(block_energy)
+                    block_offset = None
+                offset += len(line)
+
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.n_atoms = np.array(n_atoms, dtype=np.int64)
+        self.structure_ids = np.array(structure_ids, dtype=str)
+        self.energies = np.array(energies, dtype=float)
+        self._id_to_positions = None
+
+
+    def load(self) -> bool:
+        self._id_to_positions = None
+        return super().load()
+
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+
+    def _read_block(self, f, position:int) -> MLPAtoms:
+        f.seek(self.offsets[position])
+        block = []
+        for line in f:
+            line = line.decode().strip()
+            if line == "end":
+                break
+            if line != "begin":
+                block.append(line)
+        return _parse_n2p2_block(block)
+
+
+    def read(self, positions:Union[int, List[int], np.ndarray]) -> Union[MLPAtoms, List[MLPAtoms]]:
+        """read structures by their position in the data file
+
+        Args:
+            positions (Union[int, List[int], np.ndarray]): position or positions of blocks
+
+        Returns:
+            Union[MLPAtoms, List[MLPAtoms]]: MLPAtoms for an int, otherwise list in the requested order
+        """
+        if np.isscalar(positions):
+            with open_file(self.path2data, mode="rb") as f:
+                return self._read_block(f, int(np.arange(len(self))[positions]))
+
+        positions = np.arange(len(self))[np.asarray(positions, dtype=np.int64)]
+        # visit the blocks in file order so that the reads are sequential
+        order = np.argsort(positions, kind="stable")
+        all_atoms = [None] * len(positions)
+        with open_file(self.path2data, mode="rb") as f:
+            for i in order:
+                all_atoms[i] = self._read_block(f, positions[i])
+        return all_atoms
+
+
+    def __getitem__(self, key:Union[int, slice, List[int], np.ndarray]) -> Union[MLPAtoms, List[MLPAtoms]]:
+        if isinstance(key, slice):
+            return self.read(np.arange(len(self))[key])
+        return self.read(key)
+
+
+    def get_positions_by_id(self, structure_id:str) -> List[int]:
+        if self._id_to_positions is None:
+            id_to_positions: Dict[str, List[int]] = {}
+            for i, sid in enumerate(self.structure_ids.tolist()):
+                id_to_positions.setdefault(sid, []).append(i)
+            self._id_to_positions = id_to_positions
+        return self._id_to_positions.get(structure_id, [])
+
+
+    def read_by_id(self, structure_ids:Union[str, List[str]]) -> List[MLPAtoms]:
+        """read all structures whose comment line has one of the given structure_ids
+
+        Args:
+            structure_ids (Union[str, List[str]]): structure_id or list of them
+
+        Returns:
+            List[MLPAtoms]: matching structures, grouped in the order of structure_ids
+        """
+        if isinstance(structure_ids, str):
+            structure_ids = [structure_ids]
+        positions = []
+        for structure_id in structure_ids:
+            positions += self.get_positions_by_id(structure_id)
+        return self.read(positions)
+
+
+class LammpsDumpIndex(SidecarIndex):
+    """Frame index of a lammps text dumpfile: byte offset, timestep and number of atoms of every frame.
+    """
+    ARRAY_NAMES = ["offsets", "timesteps", "n_atoms"]
+
+    def build(self) -> None:
+        offsets = []
+        timesteps = []
+        n_atoms = []
+        with open_file(self.path2data, mode="rb") as f:
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                if not line.startswith(b"ITEM: TIMESTEP"):
+                    continue
+                offsets.append(offset)
+                timesteps.append(int(f.readline()))
+                f.readline()
+                n = int(f.readline())
+                n_atoms.append(n)
+                # skip box bounds (4 lines), the atoms header and the atom lines
+                deque(islice(f, n + 5), maxlen=0)
+
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.timesteps = np.array(timesteps, dtype=np.int64)
+        self.n_atoms = np.array(n_atoms, dtype=np.int64)
+
+
+class LammpsTrajectory():
+    """Random access to the frames of a lammps text dumpfile.
+
+    The frame index is built once and stored next to the dumpfile. Indexing
+    with an int reads that frame only; slicing returns a lazy view, so that
+    ``traj[9000]``, ``traj[::50]`` and ``traj.timesteps`` never scan the file.
+
+    Args:
+        path2dump (str): path to dumpfile
+        type_map (Dict[int, str], optional): lammps atom type to chemical symbol. Defaults to None.
+        path2index (str, optional): where to store the index. Defaults to <path2dump>.idx.npz.
+        rebuild (bool, optional): rebuild the index even if it is up to date. Defaults to False.
+    """
+    def __init__(self, path2dump:str, type_map:Dict[int, str]=None, path2index:str=None, rebuild:bool=False, index:LammpsDumpIndex=None, frames:np.ndarray=None) -> None:
+        self.type_map = type_map
+        self.index = LammpsDumpIndex(path2dump, path2index=path2index, rebuild=rebuild) if index is None else index
+        self.path2dump = self.index.path2data
+        self.frames = np.arange(len(self.index.offsets)) if frames is None else frames
+
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+
+    @property
+    def timesteps(self) -> np.ndarray:
+        return self.index.timesteps[self.frames]
+
+
+    @property
+    def n_atoms(self) -> np.ndarray:
+        return self.index.n_atoms[self.frames]
+
+
+    def _read_frame(self, f, frame:int) -> MLPAtoms:
+        f.seek(self.index.offsets[frame])
+        return _read_lmp_dump_frame(f, type_map=self.type_map, frame=int(frame))
+
+
+    def __getitem__(self, key:Union[int, slice, List[int], np.ndarray]) -> Union[MLPAtoms, "LammpsTrajectory"]:
+        if np.isscalar(key):
+            with open_file(self.path2dump, mode="rb") as f:
+                return self._read_frame(f, self.frames[key])
+        return LammpsTrajectory(self.path2dump, type_map=self.type_map, index=self.index, frames=self.frames[key])
+
+
+    def __iter__(self) -> Iterator[MLPAtoms]:
+        with open_file(self.path2dump, mode="rb") as f:
+            for frame in self.frames:
+                yield self._read_frame(f, frame)
+
+
+    def get_by_timestep(self, timestep:int) -> MLPAtoms:
+        frame = np.where(self.timesteps == timestep)[0]
+        if len(frame) == 0:
+            raise ValueError(f"timestep {timestep} is not in the trajectory")
+        return self[int(frame[0])]
@@ -1,14 +1,18 @@
 import os
+import re
 import numpy as np
 import pickle
 
 from abc import ABC, abstractmethod
 from ase.io import read
 from ase import Atoms
-from ase.io.espresso import read_espresso_out, read_espresso_in
+from ase.calculators.singlepoint import SinglePointCalculator
+from ase.io.espresso import read_espresso_out, read_espresso_in, label_to_symbol
+from ase.io.espresso import units as espresso_units
 
 
-from mlptools.utils.utils import get_param_idx, remove_empty_from_array
+from mlptools.io.cache import ParseCache, get_default_cache
+from mlptools.utils.utils import get_param_idx, remove_empty_from_array, open_file, resolve_compressed_path
 
 class BaseParser(ABC):
     @abstractmethod
@@ -49,24 +53,157 @@ class BaseParser(ABC):
 
 
 # Quantum espresso
+_PW_POSITION_LINE = re.compile(r'\s*\d+\s*(\S+)\s*tau\(\s*\d+\)\s*=\s*\(\s*(\S+)\s+(\S+)\s+(\S+)\s*\)')
+
+
+def parse_pwscf_out_fast(fileobj):
+    """Parse a single-point pw.x output in one streaming pass.
+
+    Reads the cell, positions, final total energy, forces, the last total
+    magnetization and the flags checked by PWscfParser.validate. Returns None
+    when the output does not look like a plain SCF run (relax, concatenated
+    runs, missing sections), so that the caller can fall back to ASE.
+    """
+    alat = None
+    celldm = None
+    nat = None
+    cell = []
+    symbols = []
+    positions = []
+    energy = None
+    forces = []
+    total_magnetization = None
+    flags = {'job_done': False, 'convergence_not_achieved': False, 'large_scf_correction': False}
+    n_start = 0
+    section = None
+
+    for line in fileobj:
+        if section == 'cell':
+            cell.append([float(x) for x in line.split()[3:6]])
+            if len(cell) == 3:
+                section = None
+            continue
+        if section == 'positions':
+            match = _PW_POSITION_LINE.match(line)
+            if match is None:
+                return None
+            symbols.append(label_to_symbol(match.group(1)))
+            positions.append([float(x) for x in match.group(2, 3, 4)])
+            if len(positions) == nat:
+                section = None
+            continue
+        if section == 'forces':
+            if 'force =' in line:
+                forces.append([float(x) for x in line.split()[-3:]])
+                if len(forces) == nat:
+                    section = None
+            continue
+
+        if 'Program PWSCF' in line:
+            n_start += 1
+            if n_start > 1:
+                return None
+        elif 'ATOMIC_POSITIONS' in line or 'CELL_PARAMETERS' in line:
+            # relax and vc-relax print updated structures
+            return None
+        elif 'celldm(1)' in line:
+            celldm = float(line.split()[1])
+        elif 'lattice parameter (alat)' in line:
+            alat = float(line.split()[4])
+        elif 'number of atoms/cell' in line:
+            nat = int(line.split()[-1])
+        elif 'crystal axes:' in line:
+            section = 'cell'
+        elif 'positions (alat units)' in line and len(positions) == 0:
+            if nat is None:
+                return None
+            section = 'positions'
+        elif line.startswith('!') and 'total energy' in line:
+            if energy is not None:
+                return None
+            energy = float(line.split()[-2]) * espresso_units['Ry']
+        elif 'Forces acting on atoms' in line and len(forces) == 0:
+            section = 'forces'
+        elif 'total magnetization' in line:
+            total_magnetization = float(line.split()[3])
+        elif line.strip() == 'JOB DONE.':
+            flags['job_done'] = True
+        elif 'convergence NOT achieved' in line:
+            flags['convergence_not_achieved'] = True
+        elif 'SCF correction compared to forces is large' in line:
+            flags['large_scf_correction'] = True
+
+    # celldm(1) has more digits than alat
+    alat = celldm if celldm is not None else alat
+    if alat is None or nat is None or len(cell) != 3 or len(positions) != nat or energy is None or len(forces) != nat:
+        return None
+
+    alat *= espresso_units['Bohr']
+    return {
+        'cell': np.array(cell) * alat,
+        'symbols': symbols,
+        'positions': np.array(positions) * alat,
+        'energy': energy,
+        'forces': np.array(forces) * espresso_units['Ry'] / espresso_units['Bohr'],
+        'total_magnetization': total_magnetization,
+        'flags': flags,
+    }
+
+
 class PWscfParser(BaseParser):
-    def __init__(self, path_to_target, name_scf_in='scf.in', name_scf_out='scf.out', structure_id=None, is_validate_strict=True) -> None:
+    def __init__(self, path_to_target, name_scf_in='scf.in', name_scf_out='scf.out', structure_id=None, is_validate_strict=True, use_fast_parser=False, use_cache=False, cache:ParseCache=None) -> None:
         super().__init__()
         self.path_to_target = path_to_target
         self.name_scf_in = name_scf_in
         self.is_validate_strict = is_validate_strict
 
-        with open(os.path.join(path_to_target, name_scf_out)) as f:
-            atom_gen = read_espresso_out(f, index=slice(None))
-            ase_atoms = next(atom_gen)
+        path2out = resolve_compressed_path(os.path.join(path_to_target, name_scf_out))
+        # an explicit cache is used as is (it also reaches worker processes), otherwise the process default
+        if cache is None and use_cache:
+            cache = get_default_cache()
+        parsed = None if cache is None else cache.load(path2out)
+        is_cached = parsed is not None
+
+        if parsed is None and use_fast_parser:
+            with open_file(path2out) as f:
+                parsed = parse_pwscf_out_fast(f)
+
+        if parsed is None:
+            with open_file(path2out) as f:
+                atom_gen = read_espresso_out(f, index=slice(None))
+                ase_atoms = next(atom_gen)
+
+            with open_file(resolve_compressed_path(f'{path_to_target}/{name_scf_in}')) as f:
+                self.I_lines = [s.strip() for s in f.readlines()]
+            with open_file(path2out) as f:
+                self.O_lines = [s.strip() for s in f.readlines()]
+
+            flags = self.get_validation_flags()
+            self.total_magnetization = self.get_total_magnetization_from_o_lines()
+            if cache is not None and ase_atoms.calc is not None and 'forces' in ase_atoms.calc.results:
+                cache.save(path2out, {
+                    'cell': ase_atoms.cell[:],
+                    'symbols': ase_atoms.get_chemical_symbols(),
+                    'positions': ase_atoms.positions,
+                    'energy': ase_atoms.get_potential_energy(),
+                    'forces': ase_atoms.get_forces(),
+                    'total_magnetization': self.total_magnetization,
+                    'flags': flags,
+                })
+            self.validate(**flags)
+        else:
+            if cache is not None and not is_cached:
+                cache.save(path2out, parsed)
+            ase_atoms = Atoms(
+                symbols=parsed['symbols'],
+                positions=parsed['positions'],
+                cell=parsed['cell'],
+                pbc=True
+            )
+            ase_atoms.calc = SinglePointCalculator(ase_atoms, energy=parsed['energy'], forces=parsed['forces'])
+            self.validate(**parsed['flags'])
+            self.total_magnetization = parsed['total_magnetization']
         self.ase_atoms = ase_atoms
-
-        with open(f'{path_to_target}/{name_scf_in}') as f:
-            self.I_lines = [s.strip() for s in f.readlines()]
-        with open(f'{path_to_target}/{name_scf_out}') as f:
-            self.O_lines = [s.strip() for s in f.readlines()]
-        
-        self.validate_o_lines()
         
         self.num_atom = ase_atoms.get_global_number_of_atoms()
         self.cell = ase_atoms.cell[:]
@@ -111,6 +248,9 @@ class PWscfParser(BaseParser):
         return self.ase_atoms.symbols
     
     def get_total_magnetization(self):
+        return self.total_magnetization
+
+    def get_total_magnetization_from_o_lines(self):
         total_mag = list(filter(lambda x: 'total magnetization' in x, self.O_lines))
         if len(total_mag) == 0:
             return None
@@ -120,19 +260,30 @@ class PWscfParser(BaseParser):
         return final_mag
 
 
+    def get_validation_flags(self):
+        return {
+            'job_done': 'JOB DONE.' in self.O_lines,
+            'convergence_not_achieved': any('convergence NOT achieved' in line for line in self.O_lines),
+            'large_scf_correction': any('SCF correction compared to forces is large' in line for line in self.O_lines),
+        }
+
+
     def validate_o_lines(self):
-        if 'JOB DONE.' not in self.O_lines:
+        self.validate(**self.get_validation_flags())
+
+
+    def validate(self, job_done, convergence_not_achieved, large_scf_correction):
+        if not job_done:
             raise Exception("invalid: job didnot finished")
-            
-        for line in self.O_lines:
-            if 'convergence NOT achieved' in line:
-                raise Exception('invalid: convergence NOT achieved')
-
-            if 'SCF correction compared to forces is large' in line:
-                if self.is_validate_strict:
-                    raise Exception('invalid: Unreliable scf result')
-                else:
-                    print('WARNING: Unreliable scf result')
+
+        if convergence_not_achieved:
+            raise Exception('invalid: convergence NOT achieved')
+
+        if large_scf_correction:
+            if self.is_validate_strict:
+                raise Exception('invalid: Unreliable scf result')
+            else:
+                print('WARNING: Unreliable scf result')
 
     
     def get_au2ang(self):
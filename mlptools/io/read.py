@@ -1,24 +1,32 @@
 import numpy as np
 import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
 from glob import glob
 import re
-from typing import List
+from itertools import islice
+from typing import Dict, Iterator, List, Union
 
-from ovito.io import import_file
-from ovito.io.ase import ovito_to_ase
 from ase import Atoms
 
 from mlptools.atoms.atom import MLPAtoms
+from mlptools.atoms.batch import AtomsBatch
 from mlptools.io.parser import PWscfParser
 from mlptools.io.parser import ASEParser
+from mlptools.io.cache import ParseCache
+from mlptools.utils.utils import open_file, resolve_compressed_path
 
 
-def read_from_format(path2target:str=None, format:str=None, structure_id=None, ase_atoms: Atoms=None, is_validate_strict=True, has_calculator=True) -> MLPAtoms:
+def read_from_format(path2target:str=None, format:str=None, structure_id=None, ase_atoms: Atoms=None, is_validate_strict=True, has_calculator=True, use_fast_parser=False, use_cache=False, cache:ParseCache=None) -> MLPAtoms:
     """Get MLPAtoms from some outputs. Currently support only PWscf
 
     Args:
         path2target (str, optional): path to output dir. Defaults to None.
         format (str, optional): Currently support only PWscf. Defaults to None.
+        use_fast_parser (bool, optional): parse scf.out in a single pass and use ASE
+            only for unfamiliar layouts. Defaults to False.
+        use_cache (bool, optional): use the on-disk parse cache (see mlptools.io.cache). Defaults to False.
+        cache (ParseCache, optional): parse cache to use instead of the default one. Defaults to None.
 
     Raises:
         Exception: If unsupported format are selected.
@@ -30,7 +38,10 @@ def read_from_format(path2target:str=None, format:str=None, structure_id=None, a
         parser = PWscfParser(
             path_to_target=path2target, 
             structure_id=structure_id,
-            is_validate_strict=is_validate_strict
+            is_validate_strict=is_validate_strict,
+            use_fast_parser=use_fast_parser,
+            use_cache=use_cache,
+            cache=cache
         )
     elif format == 'ase':
         parser = ASEParser(
@@ -54,11 +65,166 @@ def read_from_format(path2target:str=None, format:str=None, structure_id=None, a
             path=path2target,
         )
 
-def read_from_lmp_dump(path2dump:str) -> List[MLPAtoms]:
+def _read_from_format_or_error(kwargs) -> Union[MLPAtoms, Exception]:
+    try:
+        return read_from_format(**kwargs)
+    except Exception as e:
+        # the error travels back from the worker process, so make sure it can be pickled
+        try:
+            pickle.dumps(e)
+        except Exception:
+            e = Exception(f"{type(e).__name__}: {e}")
+        return e
+
+
+def read_many(paths:List[str], format:str='espresso-in', workers:int=None, structure_ids:List=None, is_validate_strict=True, use_fast_parser=False, use_cache=False, cache:ParseCache=None, chunksize:int=1) -> List[Union[MLPAtoms, Exception]]:
+    """Get MLPAtoms from many output dirs in parallel using a process pool.
+
+    Args:
+        paths (List[str]): paths to output dirs
+        format (str, optional): format passed to read_from_format. Defaults to 'espresso-in'.
+        workers (int, optional): number of worker processes. Defaults to None (number of cores).
+            With workers=1 the dirs are read in this process.
+        structure_ids (List, optional): structure_id for each path. Defaults to None.
+        is_validate_strict (bool, optional): passed to the parser. Defaults to True.
+        use_fast_parser (bool, optional): passed to the parser. Defaults to False.
+        use_cache (bool, optional): passed to the parser. Defaults to False.
+        cache (ParseCache, optional): parse cache sent to every worker. The cache set by set_default_cache is
+            process-local and does not reach workers started with spawn (macOS, Windows), so pass it here.
+            Defaults to None.
+        chunksize (int, optional): number of dirs sent to a worker at once. Defaults to 1.
+
+    Returns:
+        List[Union[MLPAtoms, Exception]]: results in the order of paths.
+            Dirs that could not be read (e.g. unconverged runs) give the raised exception instead of MLPAtoms.
+    """
+    paths = list(paths)
+    if structure_ids is None:
+        structure_ids = [None] * len(paths)
+    elif len(structure_ids) != len(paths):
+        raise ValueError("structure_ids must have the same length as paths")
+
+    all_kwargs = [
+        dict(
+            path2target=path,
+            format=format,
+            structure_id=structure_id,
+            is_validate_strict=is_validate_strict,
+            use_fast_parser=use_fast_parser,
+            use_cache=use_cache,
+            cache=cache
+        )
+        for path, structure_id in zip(paths, structure_ids)
+    ]
+    if workers == 1:
+        return [_read_from_format_or_error(kwargs) for kwargs in all_kwargs]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_read_from_format_or_error, all_kwargs, chunksize=chunksize))
+
+
+def _read_lmp_dump_frame(f, type_map:Dict[int, str]=None, frame:int=None) -> MLPAtoms:
+    """Read the frame starting at the current position of a dump file opened in binary mode.
+
+    Returns:
+        MLPAtoms: the frame, or None at the end of the file
+    """
+    line = f.readline()
+    while line and not line.startswith(b"ITEM: TIMESTEP"):
+        line = f.readline()
+    if not line:
+        return None
+    timestep = int(f.readline())
+    f.readline()
+    n_atoms = int(f.readline())
+    box_header = f.readline().split()
+    bounds = np.array(b" ".join(islice(f, 3)).split(), dtype=float).reshape(3, -1)
+    columns = [c.decode() for c in f.readline().split()[2:]]
+
+    # orthogonal boxes have 2 columns, triclinic boxes have 3 (xy, xz, yz)
+    if b"xy" in box_header:
+        xy, xz, yz = bounds[:, 2]
+        xlo = bounds[0, 0] - min(0.0, xy, xz, xy + xz)
+        xhi = bounds[0, 1] - max(0.0, xy, xz, xy + xz)
+        ylo = bounds[1, 0] - min(0.0, yz)
+        yhi = bounds[1, 1] - max(0.0, yz)
+    else:
+        xy = xz = yz = 0.0
+        xlo, xhi = bounds[0, :2]
+        ylo, yhi = bounds[1, :2]
+    zlo, zhi = bounds[2, :2]
+    cell = np.array([
+        [xhi - xlo, 0.0, 0.0],
+        [xy, yhi - ylo, 0.0],
+        [xz, yz, zhi - zlo],
+    ])
+
+    # convert the whole atom block at once
+    table = np.array(b"".join(islice(f, n_atoms)).split()).reshape(n_atoms, len(columns))
+    for position_columns in (["x", "y", "z"], ["xu", "yu", "zu"], ["xs", "ys", "zs"], ["xsu", "ysu", "zsu"]):
+        if all(c in columns for c in position_columns):
+            break
+    else:
+        raise ValueError(f"No position columns in dump: {columns}")
+    coord = table[:, [columns.index(c) for c in position_columns]].astype(float)
+    if position_columns[0].startswith("xs"):
+        coord = coord @ cell + np.array([xlo, ylo, zlo])
+
+    force = None
+    if all(c in columns for c in ["fx", "fy", "fz"]):
+        force = table[:, [columns.index(c) for c in ["fx", "fy", "fz"]]].astype(float)
+
+    if "element" in columns and type_map is None:
+        symbols = table[:, columns.index("element")].astype(str).tolist()
+    elif type_map is not None:
+        types, inverse = np.unique(table[:, columns.index("type")].astype(int), return_inverse=True)
+        missing = [t for t in types.tolist() if t not in type_map]
+        if len(missing) > 0:
+            raise ValueError(f"type {missing} is not in type_map")
+        symbols = np.array([type_map[t] for t in types.tolist()])[inverse].tolist()
+    else:
+        symbols = f'Si{n_atoms}'
+
+    return MLPAtoms(
+        cell=cell,
+        coord=coord,
+        force=force,
+        energy=None,
+        n_atoms=n_atoms,
+        structure_id=None,
+        symbols=symbols,
+        frame=frame,
+        additional_info={"timestep": timestep},
+    )
+
+
+def iter_lmp_dump(path2dump:str, type_map:Dict[int, str]=None) -> Iterator[MLPAtoms]:
+    """Iterate over the frames of a lammps text dumpfile, reading one frame at a time.
+
+    Args:
+        path2dump (str): path to dumpfile, may be gzip, xz or bz2 compressed
+        type_map (Dict[int, str], optional): lammps atom type to chemical symbol, e.g. {1: "Si", 2: "O"}.
+            If None, the element column is used when present, otherwise all atoms are Si.
+
+    Yields:
+        Iterator[MLPAtoms]: one MLPAtoms per frame. The timestep is stored in additional_info.
+    """
+    with open_file(resolve_compressed_path(path2dump), mode="rb") as f:
+        frame = 0
+        while True:
+            mlpatoms = _read_lmp_dump_frame(f, type_map=type_map, frame=frame)
+            if mlpatoms is None:
+                break
+            yield mlpatoms
+            frame += 1
+
+
+def read_from_lmp_dump(path2dump:str, type_map:Dict[int, str]=None) -> List[MLPAtoms]:
     """get list of mlpatoms from lammps dumpfile
 
     Args:
         path2dump (str): path to dumpfile
+        type_map (Dict[int, str], optional): lammps atom type to chemical symbol. Defaults to None.
 
     Raises:
         Exception: if frame is 0
@@ -66,37 +232,162 @@ def read_from_lmp_dump(path2dump:str) -> List[MLPAtoms]:
     Returns:
         List[MLPAtoms]: _
     """
-    pipeline = import_file(path2dump)
-    print(f'Number of frames: {pipeline.source.num_frames}')
-    if pipeline.source.num_frames == 0:
+    all_atoms = list(iter_lmp_dump(path2dump, type_map=type_map))
+    print(f'Number of frames: {len(all_atoms)}')
+    if len(all_atoms) == 0:
         raise Exception("There's no frame. pls see if the path ia correct")
+    return all_atoms
+
+
+class DeepmdData():
+    """Memory-mapped view of a deepmd system directory.
+
+    The set.NNN/*.npy files are opened with mmap_mode='r', so nothing is read
+    until the arrays are used. Species come from type.raw and type_map.raw.
+    MLPAtoms are only built when a frame is requested.
+
+    Args:
+        path2system (str): path to the system dir containing type.raw and set.NNN
+        type_map (List[str], optional): chemical symbol of each type. Used when type_map.raw does not exist.
+            If neither is available, all atoms are Si. ValueError if a type in type.raw is not in the type map.
+        set_names (List[str], optional): sets to load. Defaults to all set.* dirs.
+        structure_id (optional): structure_id given to the MLPAtoms. Defaults to None.
+        additional_info (optional): additional_info given to the MLPAtoms. Defaults to None.
+    """
+    ARRAY_NAMES = ["box", "coord", "energy", "force"]
+
+    def __init__(self, path2system:str, type_map:List[str]=None, set_names:List[str]=None, structure_id=None, additional_info=None) -> None:
+        if set_names is None:
+            # numeric order, so that set.1000 comes after set.999 as written by write_dp_data
+            set_names = sorted(
+                (os.path.basename(d) for d in glob(os.path.join(path2system, 'set.*'))),
+                key=lambda name: (int(name.split('.')[-1]) if name.split('.')[-1].isdigit() else float('inf'), name)
+            )
+        if len(set_names) == 0:
+            raise Exception(f"There's no set.* in {path2system}")
+        self.path2system = path2system
+        self.set_names = set_names
+        self.structure_id = structure_id
+        self.additional_info = additional_info
+
+        self.sets = []
+        for set_name in set_names:
+            arrays = {}
+            for name in self.ARRAY_NAMES:
+                path2npy = os.path.join(path2system, set_name, f'{name}.npy')
+                if os.path.exists(path2npy):
+                    arrays[name] = np.load(path2npy, mmap_mode='r')
+            self.sets.append(arrays)
+        self.n_frames_per_set = np.array([len(arrays['coord']) for arrays in self.sets], dtype=np.int64)
+        self.set_offsets = np.concatenate([[0], np.cumsum(self.n_frames_per_set)])
+        self.n_atoms = self.sets[0]['coord'].shape[1] // 3
 
-    all_atoms = []
-    # Loop over all frames of the sequence.
-    for frame_index in range(pipeline.source.num_frames):
-        data = pipeline.source.compute(frame_index)
-        ase_atoms = ovito_to_ase(data)
-
-        n_atoms = ase_atoms.get_positions().shape[0]
-        mlpatoms = MLPAtoms(
-            cell=ase_atoms.cell[:],
-            coord=ase_atoms.get_positions(),
-            force=None,
-            energy=None,
-            n_atoms=n_atoms,
-            structure_id=None,
-            symbols=f'Si{n_atoms}',
-            frame=frame_index
+        path2type = os.path.join(path2system, 'type.raw')
+        path2type_map = os.path.join(path2system, 'type_map.raw')
+        if os.path.exists(path2type_map):
+            with open(path2type_map) as f:
+                type_map = f.read().split()
+        if os.path.exists(path2type):
+            self.atom_types = np.loadtxt(path2type, dtype=int, ndmin=1)
+        else:
+            self.atom_types = np.zeros(self.n_atoms, dtype=int)
+        if type_map is None:
+            # same labelling as before type_map was supported: every atom is Si
+            self.type_map = ['Si'] * (int(self.atom_types.max()) + 1 if len(self.atom_types) > 0 else 1)
+        else:
+            self.type_map = list(type_map)
+        if len(self.atom_types) > 0 and self.atom_types.max() >= len(self.type_map):
+            raise ValueError(
+                f"type.raw of {path2system} has type {self.atom_types.max()} but type_map has only {len(self.type_map)} elements"
+            )
+        self.symbols = np.array(self.type_map)[self.atom_types].tolist()
+
+
+    def __len__(self) -> int:
+        return int(self.set_offsets[-1])
+
+
+    def get_array(self, name:str) -> np.ndarray:
+        """batched array over all frames: box (n_frames, 3, 3), coord and force (n_frames, n_atoms, 3), energy (n_frames,)
+
+        With a single set the returned array is a view of the memory map. With several sets
+        they are concatenated, which reads them into memory.
+        """
+        shape = {'box': (3, 3), 'energy': ()}.get(name, (self.n_atoms, 3))
+        arrays = [arrays[name].reshape((len(arrays[name]),) + shape) for arrays in self.sets]
+        if len(arrays) == 1:
+            return arrays[0]
+        return np.concatenate(arrays)
+
+    @property
+    def box(self) -> np.ndarray:
+        return self.get_array('box')
+
+    @property
+    def coord(self) -> np.ndarray:
+        return self.get_array('coord')
+
+    @property
+    def force(self) -> np.ndarray:
+        return self.get_array('force')
+
+    @property
+    def energy(self) -> np.ndarray:
+        return self.get_array('energy')
+
+
+    def get_atoms(self, frame:int) -> MLPAtoms:
+        frame = int(np.arange(len(self))[frame])
+        set_idx = int(np.searchsorted(self.set_offsets, frame, side='right')) - 1
+        arrays = self.sets[set_idx]
+        i = frame - self.set_offsets[set_idx]
+        force = arrays.get('force')
+        energy = arrays.get('energy')
+        return MLPAtoms(
+            cell=np.array(arrays['box'][i]).reshape(3, 3),
+            coord=np.array(arrays['coord'][i]).reshape(self.n_atoms, 3),
+            force=None if force is None else np.array(force[i]).reshape(self.n_atoms, 3),
+            energy=None if energy is None else float(np.ravel(energy[i])[0]),
+            structure_id=self.structure_id,
+            n_atoms=self.n_atoms,
+            symbols=self.symbols,
+            additional_info=self.additional_info
         )
-        all_atoms.append(mlpatoms)
-    return all_atoms
 
 
-def read_from_dp_data(path2target:str, additional_info=None) -> List[MLPAtoms]:
+    def __getitem__(self, frame:int) -> MLPAtoms:
+        return self.get_atoms(frame)
+
+
+    def to_batch(self) -> AtomsBatch:
+        """all frames as one AtomsBatch, without building MLPAtoms
+        """
+        n_frames = len(self)
+        force = self.force if all('force' in arrays for arrays in self.sets) else None
+        energy = self.energy if all('energy' in arrays for arrays in self.sets) else np.full(n_frames, np.nan)
+        return AtomsBatch(
+            positions=self.coord.reshape(-1, 3),
+            species=np.tile(np.array(self.symbols), n_frames),
+            offsets=np.arange(n_frames + 1) * self.n_atoms,
+            energy=np.ravel(energy)[:n_frames],
+            cell=self.box,
+            forces=None if force is None else force.reshape(-1, 3),
+            structure_id=np.full(n_frames, self.structure_id, dtype=object),
+        )
+
+
+    def __iter__(self) -> Iterator[MLPAtoms]:
+        for frame in range(len(self)):
+            yield self.get_atoms(frame)
+
+
+def read_from_dp_data(path2target:str, additional_info=None, type_map:List[str]=None) -> List[MLPAtoms]:
     """Get list of MLPAtoms from deepmd data.
 
     Args:
         path2target (str): path to output dir. Defaults to None.
+        type_map (List[str], optional): chemical symbol of each type, used when type_map.raw does not exist.
+            Defaults to None (all atoms are Si).
 
     Raises:
         Exception: If path is uncorrect
@@ -108,82 +399,110 @@ def read_from_dp_data(path2target:str, additional_info=None) -> List[MLPAtoms]:
         raise Exception("Invalid path")
     m = re.search('/mp-.*?/', path2target)
     id = '_'.join(m.group(0)[1:-1].split('_')[:-1])
-    
-    all_atoms = []
-    all_box = np.load(os.path.join(path2target, 'box.npy'))
-    all_force = np.load(os.path.join(path2target, 'force.npy'))
-    all_energy = np.load(os.path.join(path2target, 'energy.npy'))
-    all_coord = np.load(os.path.join(path2target, 'coord.npy'))
-    for (box, coord, force, energy) in zip(all_box, all_coord, all_force, all_energy):
-        n_atoms = int(len(coord)/3)
-        atoms = MLPAtoms(
-            cell=box.reshape(3,3),
-            coord=coord.reshape(n_atoms, 3),
-            force=force.reshape(n_atoms, 3),
-            energy=energy[0] if type(energy) == np.ndarray else energy,
-            structure_id=id,
-            n_atoms=n_atoms,
-            symbols=f'Si{n_atoms}',
-            additional_info=additional_info
-        )
-        all_atoms.append(atoms)
-    return all_atoms
 
+    path2target = os.path.normpath(path2target)
+    data = DeepmdData(
+        os.path.dirname(path2target),
+        type_map=type_map,
+        set_names=[os.path.basename(path2target)],
+        structure_id=id,
+        additional_info=additional_info
+    )
+    return list(data)
 
-def read_from_n2p2_data(path2target:str, data_filename:str="input.data") -> List[MLPAtoms]:
-    def get_lattice_from_n2p2_data(path2target):
-        with open(os.path.join(path2target, data_filename), mode="r") as f:
-            lines = [s.strip() for s in f.readlines()]
-        block = []
-        block_start = []
-        block_end = []
-        for i, line in enumerate(lines):
+
+def _parse_n2p2_block(lines: List[str], block_idx: int = None) -> MLPAtoms:
+    """Build MLPAtoms from the stripped lines between ``begin`` and ``end``.
+
+    Atom lines are converted to arrays in one shot instead of one list per atom.
+    block_idx (0-based index of the structure in the file) is only used in error messages.
+    """
+    structure_id = None
+    lattice = []
+    atom_lines = []
+    energy = None
+    for line in lines:
+        if line.startswith("atom"):
+            atom_lines.append(line)
+        elif line.startswith("lattice"):
+            lattice.append(line.split()[1:4])
+        elif line.startswith("energy"):
+            energy = float(line.split()[-1])
+        elif line.startswith("comment"):
+            comment = line.split()
+            structure_id = comment[1] if len(comment) > 1 else None
+
+    if len(atom_lines) == 0:
+        raise ValueError(f"n2p2 structure {block_idx} (comment: {structure_id}) has no atom lines")
+
+    # atom x y z element charge n fx fy fz
+    atom_table = np.array(' '.join(atom_lines).split()).reshape(len(atom_lines), -1)
+    coord = atom_table[:, 1:4].astype(float)
+    force = atom_table[:, -3:].astype(float)
+    chemical_symbols = atom_table[:, 4].tolist()
+
+    return MLPAtoms(
+        cell=np.array(lattice, dtype=float),
+        coord=coord,
+        force=force,
+        energy=energy,
+        n_atoms=len(coord),
+        structure_id=structure_id,
+        symbols=chemical_symbols,
+    )
+
+
+def iter_n2p2_data(path2target:str, data_filename:str="input.data", batch_size:int=None) -> Iterator[MLPAtoms]:
+    """Iterate over the structures of n2p2 input.data in a single pass.
+
+    Only the block currently being parsed is kept in memory, so memory use does not
+    depend on the size of the file.
+
+    Args:
+        path2target (str): path to the directory containing the data file
+        data_filename (str, optional): name of the data file. Defaults to "input.data".
+            A gzip, xz or bz2 compressed file (e.g. input.data.gz) is decompressed on the fly.
+        batch_size (int, optional): if given, yield lists of up to batch_size MLPAtoms
+            instead of single MLPAtoms. Defaults to None.
+
+    Yields:
+        Iterator[MLPAtoms]: MLPAtoms (or List[MLPAtoms] if batch_size is set)
+    """
+    if batch_size is not None and batch_size < 1:
+        raise ValueError("batch_size must be positive")
+
+    batch = []
+    block_idx = 0
+    with open_file(resolve_compressed_path(os.path.join(path2target, data_filename)), mode="r") as f:
+        block = None
+        for line in f:
+            line = line.strip()
             if line == "begin":
-                block_start.append(i)
+                block = []
             elif line == "end":
-                block_end.append(i)
+                if block is None:
+                    continue
+                mlpatom = _parse_n2p2_block(block, block_idx=block_idx)
+                block = None
+                block_idx += 1
+                if batch_size is None:
+                    yield mlpatom
+                    continue
+                batch.append(mlpatom)
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+            elif block is not None:
+                block.append(line)
+    if len(batch) > 0:
+        yield batch
 
-        for i in range(len(block_start)):
-            block.append(lines[block_start[i] : block_end[i] + 1])
-        return block
-    
-    blocks = get_lattice_from_n2p2_data(path2target)
 
+def read_from_n2p2_data(path2target:str, data_filename:str="input.data") -> List[MLPAtoms]:
     all_mlpatoms = []
-    for i, block in enumerate(blocks):
+    for i, mlpatom in enumerate(iter_n2p2_data(path2target, data_filename=data_filename)):
         # show progress
         if i % 1000 == 0:
-            print(f"{i} / {len(blocks)}")
-            
-        comment = [l for l in block if l.startswith("comment")]
-        structure_id = comment[0].split(' ')[1]
-
-        lattice = [l for l in block if l.startswith("lattice")]
-        lattice = np.array([list(filter(None, l.split(' ')))[1:] for l in lattice], dtype=float)
-        
-        atoms = [l for l in block if l.startswith("atom")]
-        coord = []
-        force = []
-        chemical_symbols = []
-        for atom in atoms:
-            splitted_atom = list(filter(None, atom.split(' ')))
-            coord.append(splitted_atom[1:4])
-            force.append(splitted_atom[-3:])
-            chemical_symbols.append(splitted_atom[4])
-        coord = np.array(coord, dtype=float)
-        force = np.array(force, dtype=float)
-        
-        energy = float([l for l in block if l.startswith("energy")][0].split(' ')[-1])
-        charge = float([l for l in block if l.startswith("charge")][0].split(' ')[-1])
-
-        mlpatom = MLPAtoms(
-            cell=lattice,
-            coord=coord,
-            force=force,
-            energy=energy,
-            n_atoms=len(coord),
-            structure_id=structure_id,
-            symbols=chemical_symbols,
-        )
+            print(f"{i} structures loaded")
         all_mlpatoms.append(mlpatom)
-    return all_mlpatoms
\ No newline at end of file
+    return all_mlpatoms
@@ -1,7 +1,8 @@
 from mlptools.atoms.atom import MLPAtoms
 from mlptools.utils.utils import flatten
-from typing import List
+from typing import IO, Dict, Iterable, List, Union
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
 from ase import Atoms
 import os
 import numpy as np  
@@ -15,6 +16,184 @@ def write_from_atoms(atoms: MLPAtoms, format: str, structure_id=None) -> List[st
     
     return writer.output()
 
+def write_n2p2(
+        all_atoms: Iterable[MLPAtoms],
+        path_or_fh: Union[str, IO],
+        float_format: str = '%.10f',
+        is_comment: bool = True,
+        has_calculator: bool = True,
+        buffer_size: int = 1 << 24
+    ) -> int:
+    """Write structures to n2p2 input.data.
+
+    The atom lines of a structure are formatted with a single string operation
+    and the output is written in chunks of about buffer_size characters, so
+    structures can be streamed from a reader without building lists of lines.
+
+    Args:
+        all_atoms (Iterable[MLPAtoms]): structures to write
+        path_or_fh (Union[str, IO]): output path or an open text file
+        float_format (str, optional): printf-style format of every float. Defaults to '%.10f'.
+        is_comment (bool, optional): write the comment line with structure_id. Defaults to True.
+        has_calculator (bool, optional): if False, energy and forces are written as 0. Defaults to True.
+        buffer_size (int, optional): number of characters buffered before writing. Defaults to 16M.
+
+    Returns:
+        int: number of structures written
+    """
+    lattice_fmt = f'lattice {float_format} {float_format} {float_format}\n' * 3
+    atom_fmt = f'atom {float_format} {float_format} {float_format} %s 0 0 {float_format} {float_format} {float_format}\n'
+    energy_fmt = f'energy {float_format}\n'
+
+    def _write(fh):
+        buffer = []
+        buffered = 0
+        n_written = 0
+        for atoms in all_atoms:
+            coord = np.asarray(atoms.coord, dtype=float)
+            n_atoms = len(coord)
+            if has_calculator:
+                force = np.asarray(atoms.force, dtype=float)
+                energy = atoms.energy
+            else:
+                force = np.zeros((n_atoms, 3))
+                energy = 0.0
+            # x y z symbol fx fy fz for every atom, flattened in line order
+            atom_values = np.empty((n_atoms, 7), dtype=object)
+            atom_values[:, :3] = coord
+            atom_values[:, 3] = atoms.get_chemical_symbols()
+            atom_values[:, 4:] = force
+
+            block = ['begin\n']
+            if is_comment:
+                block.append(f'comment {atoms.structure_id} .\n')
+            block.append(lattice_fmt % tuple(np.asarray(atoms.cell, dtype=float).ravel().tolist()))
+            block.append((atom_fmt * n_atoms) % tuple(atom_values.ravel().tolist()))
+            block.append(energy_fmt % energy)
+            block.append('charge 0.0\nend\n')
+            block = ''.join(block)
+
+            buffer.append(block)
+            buffered += len(block)
+            n_written += 1
+            if buffered >= buffer_size:
+                fh.write(''.join(buffer))
+                buffer = []
+                buffered = 0
+        fh.write(''.join(buffer))
+        return n_written
+
+    if isinstance(path_or_fh, str):
+        with open(path_or_fh, mode='w') as fh:
+            return _write(fh)
+    return _write(path_or_fh)
+
+
+class _DeepmdSystemBuffer():
+    """Preallocated set.NNN shard of one deepmd system, flushed to disk when full
+    """
+    def __init__(self, path2system: str, n_atoms: int, set_size: int) -> None:
+        self.path2system = path2system
+        self.set_size = set_size
+        self.box = np.empty((set_size, 9))
+        self.coord = np.empty((set_size, n_atoms * 3))
+        self.force = np.empty((set_size, n_atoms * 3))
+        self.energy = np.empty(set_size)
+        self.n_frames = 0
+        self.n_sets = 0
+        self.n_written = 0
+
+    def append(self, cell, coord, force, energy) -> None:
+        i = self.n_frames
+        self.box[i] = np.ravel(cell)
+        self.coord[i] = np.ravel(coord)
+        self.force[i] = np.ravel(force)
+        self.energy[i] = energy
+        self.n_frames += 1
+        if self.n_frames == self.set_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.n_frames == 0:
+            return
+        path2set = os.path.join(self.path2system, f'set.{self.n_sets:03d}')
+        os.makedirs(path2set, exist_ok=True)
+        for name in ['box', 'coord', 'force', 'energy']:
+            np.save(os.path.join(path2set, f'{name}.npy'), getattr(self, name)[:self.n_frames])
+        self.n_written += self.n_frames
+        self.n_sets += 1
+        self.n_frames = 0
+
+
+def write_dp_data(
+        all_atoms: Iterable[MLPAtoms],
+        path2output: str,
+        set_size: int = 5000,
+        type_map: List[str] = None,
+        has_calculator: bool = True
+    ) -> Dict[str, int]:
+    """Write structures as deepmd data, one system dir per composition.
+
+    Structures with the same number of atoms of every species go to the same
+    system dir (e.g. O128Si64), with atoms sorted by type. Each system writes
+    type.raw and type_map.raw and its frames in set.000, set.001, ... of
+    set_size frames. Every shard is preallocated and written once, so memory
+    use is bounded by one shard per system.
+
+    Args:
+        all_atoms (Iterable[MLPAtoms]): structures to write
+        path2output (str): output dir
+        set_size (int, optional): number of frames per set.NNN. Defaults to 5000.
+        type_map (List[str], optional): chemical symbol of each type. Defaults to the order in which species appear.
+        has_calculator (bool, optional): if False, energy and forces are written as 0. Defaults to True.
+
+    Returns:
+        Dict[str, int]: number of frames written for each system
+    """
+    if set_size < 1:
+        raise ValueError("set_size must be positive")
+    type_map = [] if type_map is None else list(type_map)
+    type_idx = {symbol: i for i, symbol in enumerate(type_map)}
+    systems: Dict[tuple, _DeepmdSystemBuffer] = {}
+    system_types: Dict[tuple, np.ndarray] = {}
+
+    for atoms in all_atoms:
+        symbols = atoms.get_chemical_symbols()
+        for symbol in symbols:
+            if symbol not in type_idx:
+                type_idx[symbol] = len(type_map)
+                type_map.append(symbol)
+        types = np.array([type_idx[symbol] for symbol in symbols])
+        order = np.argsort(types, kind='stable')
+        types = types[order]
+        counts = np.bincount(types)
+        key = tuple((t, c) for t, c in enumerate(counts.tolist()) if c > 0)
+
+        if key not in systems:
+            system_name = ''.join(f'{type_map[t]}{c}' for t, c in sorted(key, key=lambda x: type_map[x[0]]))
+            systems[key] = _DeepmdSystemBuffer(os.path.join(path2output, system_name), len(types), set_size)
+            system_types[key] = types
+
+        coord = np.asarray(atoms.coord, dtype=float)[order]
+        if has_calculator:
+            force = np.asarray(atoms.force, dtype=float)[order]
+            energy = atoms.energy
+        else:
+            force = np.zeros_like(coord)
+            energy = 0.0
+        systems[key].append(atoms.cell, coord, force, energy)
+
+    n_frames = {}
+    for key, system in systems.items():
+        system.flush()
+        with open(os.path.join(system.path2system, 'type.raw'), 'w') as f:
+            f.write('\n'.join(map(str, system_types[key].tolist())) + '\n')
+        with open(os.path.join(system.path2system, 'type_map.raw'), 'w') as f:
+            f.write('\n'.join(type_map) + '\n')
+        n_frames[os.path.basename(system.path2system)] = system.n_written
+    return n_frames
+
+
 class BaseWriter(ABC):
     def __init__(self, atoms) -> None:
         self.atoms = atoms
@@ -23,12 +202,117 @@ class BaseWriter(ABC):
     def output(self):
         raise NotImplementedError
 
+class QuantumEspressoTemplate():
+    """scf.in template that is read and searched only once.
+
+    The outdir, nat, CELL_PARAMETERS {angstrom} and ATOMIC_POSITIONS {crystal}
+    lines are located when the template is loaded, and render() fills them
+    for each structure.
+
+    Args:
+        path2template (str): dir containing the template
+        scf_filename (str, optional): name of the template file. Defaults to "scf.in".
+    """
+    def __init__(self, path2template: str, scf_filename="scf.in") -> None:
+        with open(os.path.join(path2template, scf_filename), 'r') as f:
+            self.lines = [line.strip() for line in f.readlines()]
+        self.scf_filename = scf_filename
+
+        self.outdir_idx = self.get_param_idx('outdir')
+        self.nat_idx = self.get_param_idx('nat')
+        self.cell_idx = self.get_param_idx('CELL_PARAMETERS {angstrom}')
+        self.position_idx = self.get_param_idx('ATOMIC_POSITIONS {crystal}')
+        for name in ['nat_idx', 'cell_idx', 'position_idx']:
+            if getattr(self, name) is None:
+                raise ValueError(f"{name.replace('_idx', '')} is not found in the template")
+
+    def get_param_idx(self, param):
+        for i, line in enumerate(self.lines):
+            if param in line:
+                return i
+        return None
+
+    def render(self, atoms: Atoms, out_dir=None) -> List[str]:
+        """lines of scf.in for atoms
+        """
+        lines = list(self.lines)
+        # change outdir
+        if out_dir is not None:
+            if self.outdir_idx is None:
+                raise ValueError("outdir is not found in the template")
+            lines[self.outdir_idx] = f"outdir = '{out_dir}'"
+        # change num of atoms
+        num_atoms = atoms.get_global_number_of_atoms()
+        lines[self.nat_idx] = f'nat = {num_atoms}'
+
+        cell_lines = ('%s %s %s\n' * 3 % tuple(np.asarray(atoms.get_cell()).ravel().tolist())).splitlines()
+        position_values = np.empty((num_atoms, 4), dtype=object)
+        position_values[:, 0] = atoms.get_chemical_symbols()
+        position_values[:, 1:] = atoms.get_scaled_positions()
+        position_lines = ('%s %s %s %s\n' * num_atoms % tuple(position_values.ravel().tolist())).splitlines()
+
+        # insert after the card lines, starting from the later one so that the earlier index stays valid
+        insertions = sorted([(self.cell_idx, cell_lines), (self.position_idx, position_lines)], reverse=True)
+        for idx, inserted_lines in insertions:
+            lines[idx+1:idx+1] = inserted_lines
+        return lines
+
+    def write(self, atoms: Atoms, path2output: str, out_dir=None) -> None:
+        """write scf.in for atoms to path2output
+        """
+        with open(path2output, 'w') as f:
+            f.write('\n'.join(self.render(atoms, out_dir=out_dir)) + '\n')
+
+    def _write_in_dir(self, args) -> str:
+        atoms, path2dir, out_dir = args
+        os.makedirs(path2dir, exist_ok=True)
+        path2output = os.path.join(path2dir, self.scf_filename)
+        self.write(atoms, path2output, out_dir=out_dir)
+        return path2output
+
+    def write_many(
+            self,
+            all_atoms: Iterable[Atoms],
+            path2root: str,
+            structure_ids: List[str] = None,
+            out_dir=None,
+            workers: int = 1,
+            chunksize: int = 64
+        ) -> List[str]:
+        """write <path2root>/<structure_id>/scf.in for every structure
+
+        Args:
+            all_atoms (Iterable[Atoms]): structures
+            path2root (str): root dir
+            structure_ids (List[str], optional): name of the dir of each structure. Defaults to 0, 1, 2, ...
+            out_dir (optional): outdir written into every scf.in. Defaults to None (keep the template).
+            workers (int, optional): number of processes used for writing. Defaults to 1.
+            chunksize (int, optional): number of structures sent to a process at once. Defaults to 64.
+
+        Returns:
+            List[str]: paths of the written files
+        """
+        all_atoms = list(all_atoms)
+        if structure_ids is None:
+            structure_ids = [str(i) for i in range(len(all_atoms))]
+        elif len(structure_ids) != len(all_atoms):
+            raise ValueError("structure_ids must have the same length as all_atoms")
+        args = [(atoms, os.path.join(path2root, str(structure_id)), out_dir) for atoms, structure_id in zip(all_atoms, structure_ids)]
+
+        if workers == 1:
+            return [self._write_in_dir(arg) for arg in args]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self._write_in_dir, args, chunksize=chunksize))
+
+
 class QuantumEspressoWriter(BaseWriter):
-    def __init__(self, atoms: Atoms, path2template: str, scf_filename="scf.in", out_dir=None) -> None:
+    def __init__(self, atoms: Atoms, path2template: str, scf_filename="scf.in", out_dir=None, template: QuantumEspressoTemplate=None) -> None:
         super().__init__(atoms)
         self.template = path2template
         self.scf_filename = scf_filename
         self.out_dir = out_dir
+        # pass a loaded template to avoid reading it again for every structure
+        self.compiled_template = template
     
     def read_template(self):
         # read scf.in.template
@@ -52,39 +336,9 @@ class QuantumEspressoWriter(BaseWriter):
         return result
     
     def output(self):
-        scf_input_lines = self.read_template()
-        # change outdir
-        if self.out_dir is not None:
-            outdir_idx = self.get_param_idx('outdir', scf_input_lines)
-            scf_input_lines[outdir_idx] = f"outdir = '{self.out_dir}'"
-        # change num of atoms
-        num_atoms = self.atoms.get_global_number_of_atoms()
-        num_atoms_idx = self.get_param_idx('nat', scf_input_lines)
-        scf_input_lines[num_atoms_idx] = f'nat = {num_atoms}'
-
-        cell_lines = []
-        for vec in self.atoms.get_cell():
-            cell_line = ' '.join(map(str, vec))
-            cell_lines.append(cell_line)
-            # print(cell_line)
-        # change cell
-        cell_idx = self.get_param_idx('CELL_PARAMETERS {angstrom}', scf_input_lines) 
-        # insert list to list
-        scf_input_lines.insert(cell_idx+1, cell_lines[0])
-        scf_input_lines.insert(cell_idx+2, cell_lines[1])
-        scf_input_lines.insert(cell_idx+3, cell_lines[2])
-
-        position_lines = []
-        for symbol, scaled_position in zip(self.atoms.get_chemical_symbols(), self.atoms.get_scaled_positions()):
-            position_line = f'{symbol} ' + ' '.join(map(str, scaled_position))
-            position_lines.append(position_line)
-            # print(position_line)
-        # change position
-        position_idx = self.get_param_idx('ATOMIC_POSITIONS {crystal}', scf_input_lines)
-        scf_input_lines.insert(position_idx+1, position_lines)
-
-        scf_input_lines = self.flatten(scf_input_lines)
-        return scf_input_lines
+        if self.compiled_template is None:
+            self.compiled_template = QuantumEspressoTemplate(self.template, scf_filename=self.scf_filename)
+        return self.compiled_template.render(self.atoms, out_dir=self.out_dir)
 
 class N2p2Writer(BaseWriter):
     def __init__(
@@ -41,7 +41,12 @@ elements_dict = {'H' : 1.008,'HE' : 4.003, 'LI' : 6.941, 'BE' : 9.012,
                  'OG' : 294}
 
 
-def get_all_si_atoms(device='local') -> List[MLPAtoms]:
+def get_all_si_atoms(device='local', path2h5=None) -> List[MLPAtoms]:
+    if path2h5 is not None:
+        # single-file store created by mlptools.io.hdf5.migrate_pickle_tree
+        from mlptools.io.hdf5 import HDF5AtomsStore
+        return HDF5AtomsStore(path2h5)[:]
+
     if device == 'local':
         path2data = '/Users/y1u0d2/desktop/Lab/data/qe_data/Si/atoms'
     elif device == 'gpu':
@@ -1,4 +1,10 @@
+import bz2
 import collections
+import gzip
+import itertools
+import lzma
+import os
+from typing import Tuple
 from mlptools.utils.constants import elements_dict
 
 
@@ -32,6 +38,59 @@ def get_param_idx(param, lines):
     else:
         return param_idx
 
+def get_file_signature(path: str) -> Tuple[int, int]:
+    """
+    (size, mtime_ns) of a file, used to detect when sidecar files are stale
+    """
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+COMPRESSION_SUFFIXES = ('.gz', '.xz', '.bz2')
+
+def resolve_compressed_path(path: str) -> str:
+    """
+    path itself if it exists, otherwise the first existing compressed variant (path.gz, path.xz, path.bz2).
+    path is returned unchanged if none of them exists
+    """
+    if os.path.exists(path):
+        return path
+    for suffix in COMPRESSION_SUFFIXES:
+        if os.path.exists(path + suffix):
+            return path + suffix
+    return path
+
+def open_file(path: str, mode: str = 'r'):
+    """
+    open a file, decompressing gzip, xz and bz2 files on the fly.
+    The compression is detected from the magic bytes, not from the file name
+    """
+    with open(path, mode='rb') as f:
+        magic = f.read(6)
+    if magic.startswith(b'\x1f\x8b'):
+        opener = gzip.open
+    elif magic.startswith(b'\xfd7zXZ\x00'):
+        opener = lzma.open
+    elif magic.startswith(b'BZh'):
+        opener = bz2.open
+    else:
+        return open(path, mode=mode)
+    if 'b' not in mode and 't' not in mode:
+        mode += 't'
+    return opener(path, mode=mode)
+
+def imap_bounded(executor, func, iterable, max_in_flight: int):
+    """
+    executor.map that submits at most max_in_flight tasks ahead of the consumer,
+    so that a long (or lazy) iterable is not materialized at once. Results are yielded in order
+    """
+    iterator = iter(iterable)
+    futures = collections.deque(executor.submit(func, item) for item in itertools.islice(iterator, max_in_flight))
+    while futures:
+        result = futures.popleft().result()
+        for item in itertools.islice(iterator, 1):
+            futures.append(executor.submit(func, item))
+        yield result
+
 def remove_empty_from_array(arr: list) -> list:
     return list(filter(None, arr))
 